@@ -12,6 +12,7 @@ import zipfile
 from datamart_core.common import log_future
 from datamart_geo import GeoData
 from datamart_materialize import get_writer
+from datamart_profiler.spatial import NominatimClient
 
 from .graceful_shutdown import GracefulApplication
 
@@ -167,7 +168,10 @@ class Application(GracefulApplication):
         self.minio = minio
 
         if os.environ.get('NOMINATIM_URL'):
-            self.nominatim = os.environ['NOMINATIM_URL']
+            self.nominatim = NominatimClient(
+                os.environ['NOMINATIM_URL'],
+                '/cache/nominatim.sqlite3',
+            )
         else:
             self.nominatim = None
             logger.warning(
@@ -1,10 +1,9 @@
-import csv
 from datetime import datetime
 import logging
 import zipfile
 
 from datamart_profiler import parse_date
-from datamart_profiler.core import count_rows_to_skip
+from datamart_profiler.core import FileProbe
 
 from .common import skip_rows
 from .excel import xlsx_to_csv
@@ -20,9 +19,6 @@ from .csv import csv_to_parquet
 logger = logging.getLogger(__name__)
 
 
-DELIMITERS = ',\t;|'
-
-
 def detect_format_convert_to_csv(dataset_path, convert_dataset, materialize):
     """Detect supported formats and convert to CSV.
 
@@ -92,44 +88,30 @@ def detect_format_convert_to_csv(dataset_path, convert_dataset, materialize):
         # Update file
         dataset_path = convert_dataset(spss_to_csv, dataset_path)
 
-    # Check for TSV file format
-    with open(dataset_path, 'r') as fp:
-        # Read at least 65kB and 3 lines, and at most 5MB
-        sample = fp.read(65536)
-        newlines = sample.count('\n')
-        while newlines < 3 and len(sample) < 5242880:
-            more = fp.read(65536)
-            if not more:
-                break
-            sample += more
-            newlines += more.count('\n')
-
-        # Run the sniffer
-        dialect = csv.get_dialect('excel')
-        if newlines >= 3:
-            try:
-                dialect = csv.Sniffer().sniff(sample, DELIMITERS)
-            except Exception as error:  # csv.Error, UnicodeDecodeError
-                logger.warning("csv.Sniffer error: %s", error)
-        else:
-            logger.warning("Lines are too long to use csv.Sniffer")
-    if getattr(dialect, 'delimiter', ',') != ',':
-        # Update metadata
-        logger.info("Detected separator is %r", dialect.delimiter)
-        materialize.setdefault('convert', []).append({
-            'identifier': 'tsv',
-            'separator': dialect.delimiter,
-        })
+    # The CSV file is mapped in memory once, and probed again only after it
+    # gets converted
+    probe = FileProbe(dataset_path)
+    try:
+        # Check for TSV file format
+        dialect = probe.dialect
+        if getattr(dialect, 'delimiter', ',') != ',':
+            # Update metadata
+            logger.info("Detected separator is %r", dialect.delimiter)
+            materialize.setdefault('convert', []).append({
+                'identifier': 'tsv',
+                'separator': dialect.delimiter,
+            })
 
-        # Update file
-        dataset_path = convert_dataset(
-            lambda s, d: tsv_to_csv(s, d, separator=dialect.delimiter),
-            dataset_path,
-        )
-
-    # Check for non-data rows at the top of the file
-    with open(dataset_path, 'r') as fp:
-        non_data_rows = count_rows_to_skip(fp)
+            # Update file
+            probe.close()
+            dataset_path = convert_dataset(
+                lambda s, d: tsv_to_csv(s, d, separator=dialect.delimiter),
+                dataset_path,
+            )
+            probe = FileProbe(dataset_path)
+
+        # Check for non-data rows at the top of the file
+        non_data_rows = probe.rows_to_skip
         if non_data_rows > 0:
             # Update metadata
             logger.info("Detected %d lines to skip", non_data_rows)
@@ -139,18 +121,17 @@ def detect_format_convert_to_csv(dataset_path, convert_dataset, materialize):
             })
 
             # Update file
+            probe.close()
             dataset_path = convert_dataset(
                 lambda s, d: skip_rows(s, d, nb_rows=non_data_rows),
                 dataset_path,
             )
+            probe = FileProbe(dataset_path)
 
-    # Check for pivoted temporal table
-    with open(dataset_path, 'r') as fp:
-        reader = csv.reader(fp)
-        try:
-            columns = next(iter(reader))
-        except StopIteration:
-            columns = []
+        # Check for pivoted temporal table
+        columns = probe.header or []
+    finally:
+        probe.close()
     if len(columns) >= 3:
         # Look for dates
         non_dates = [
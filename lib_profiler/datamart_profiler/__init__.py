@@ -1,8 +1,8 @@
-from .core import count_rows_to_skip, process_dataset
+from .core import FileProbe, count_rows_to_skip, process_dataset
 from .temporal import parse_date
 
 
 __version__ = '0.11'
 
 
-__all__ = ['count_rows_to_skip', 'process_dataset', 'parse_date']
+__all__ = ['FileProbe', 'count_rows_to_skip', 'process_dataset', 'parse_date']
@@ -74,6 +74,23 @@ def main():
     parser.add_argument('--load-max-size', action='store', nargs=1,
                         help="target size of the data to be analyzed. The "
                              "data will be randomly sampled if it is bigger")
+    parser.add_argument('--workers', action='store', type=int, default=None,
+                        help="number of processes to use to profile columns "
+                             "in parallel")
+    parser.add_argument('--streaming', action='store_true', default=False,
+                        help="if the file is bigger than the load max size, "
+                             "read all of it in chunks to compute statistics")
+    parser.add_argument('--geo-cache', action='store', default=None,
+                        help="SQLite file where to keep the resolved names "
+                             "of administrative areas, between runs")
+    parser.add_argument('--cache', action='store', default=None,
+                        help="directory where to keep profiles, so unchanged "
+                             "files are not profiled again")
+    parser.add_argument('--type-sampling', action='store_true',
+                        default=False,
+                        help="detect the type of columns on a random sample "
+                             "first, only looking at all the values if it "
+                             "is not conclusive")
     parser.add_argument('file', nargs=1, help="file to profile")
     if detect_format_convert_to_csv is None:
         parser.add_argument(
@@ -122,6 +139,9 @@ def main():
     except FileNotFoundError:
         logger.warning("datamart-geo is installed but no data is available")
         geo_data = None
+    if geo_data is not None and args.geo_cache:
+        from datamart_profiler.spatial import CachedGeoData
+        geo_data = CachedGeoData(geo_data, args.geo_cache)
 
     # Parse max size
     load_max_size = None
@@ -174,6 +194,10 @@ def main():
                 coverage=args.coverage,
                 plots=args.plots,
                 load_max_size=load_max_size,
+                workers=args.workers,
+                streaming=args.streaming,
+                cache=args.cache,
+                type_sampling=args.type_sampling,
             )
         except (pandas.errors.ParserError, UnicodeError):
             if detect_format_convert_to_csv is None:
@@ -0,0 +1,161 @@
+"""Cache of profiles, so unchanged data doesn't have to be profiled again.
+
+Profiles are keyed by a hash of the data, the version of the profiler, and the
+options that change the result, see `profile_cache_key()`. The cache given to
+``process_dataset()`` can be a `ProfileCache` directory, or any dict-like
+object with ``get()`` and ``__setitem__()`` mapping those keys to JSON strings
+(for example a ``dict``, or a Redis client).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pandas
+import tempfile
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+PROFILE_CACHE_SIZE = 100000000  # 100 MB
+
+HASH_CHUNK_SIZE = 1 << 20  # 1 MB
+
+
+def hash_data(data):
+    """Compute the SHA1 hash of the data to profile.
+
+    :param data: Path to a file, file object, or DataFrame, like
+        ``process_dataset()`` accepts. File objects are read to the end and
+        moved back to the start.
+    :return: The hash, as a hexadecimal string
+    """
+    sha1 = hashlib.sha1()
+    if isinstance(data, pandas.DataFrame):
+        sha1.update(json.dumps(
+            [
+                [str(name) for name in data.columns],
+                [str(dtype) for dtype in data.dtypes],
+                [str(name) for name in data.index.names],
+            ],
+        ).encode('utf-8'))
+        sha1.update(
+            pandas.util.hash_pandas_object(data, index=True).values.tobytes()
+        )
+    elif isinstance(data, (str, bytes)):
+        with open(data, 'rb') as fp:
+            _hash_file(sha1, fp)
+    else:
+        data.seek(0, 0)
+        _hash_file(sha1, data)
+        data.seek(0, 0)
+    return sha1.hexdigest()
+
+
+def _hash_file(sha1, fp):
+    while True:
+        chunk = fp.read(HASH_CHUNK_SIZE)
+        if not chunk:
+            break
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        sha1.update(chunk)
+
+
+def profile_cache_key(data_hash, options):
+    """Build the key a profile is cached under.
+
+    :param data_hash: Hash of the data, from `hash_data()`
+    :param options: Dict of the options that change the profile
+    """
+    from . import __version__
+
+    return hashlib.sha1(json.dumps(
+        [data_hash, __version__, options],
+        sort_keys=True, default=str,
+    ).encode('utf-8')).hexdigest()
+
+
+class ProfileCache(object):
+    """Keep profiles as files in a local directory.
+
+    When the total size goes over `max_size`, the profiles that were used the
+    least recently are removed. Files are written atomically, so the directory
+    can be shared by multiple processes.
+
+    :param path: The directory, created if it doesn't exist
+    :param max_size: Maximum size of the cached profiles, in bytes
+    """
+    def __init__(self, path, *, max_size=PROFILE_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.json')
+
+    def __getitem__(self, key):
+        filename = self._file(key)
+        try:
+            with open(filename, 'r', encoding='utf-8') as fp:
+                value = fp.read()
+        except FileNotFoundError:
+            raise KeyError(key)
+        # Mark it as recently used
+        try:
+            os.utime(filename)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return os.path.exists(self._file(key))
+
+    def __setitem__(self, key, value):
+        fd, temp = tempfile.mkstemp(prefix='.profile', dir=self.path)
+        try:
+            with open(fd, 'w', encoding='utf-8') as fp:
+                fp.write(value)
+            os.replace(temp, self._file(key))
+        except BaseException:
+            os.remove(temp)
+            raise
+        self._evict()
+
+    def _evict(self):
+        """Remove the least recently used profiles over the size limit.
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    if not entry.name.endswith('.json'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total <= self.max_size:
+                return
+            entries.sort()
+            for _, size, filename in entries:
+                if total <= self.max_size:
+                    break
+                try:
+                    os.remove(filename)
+                except FileNotFoundError:
+                    pass
+                total -= size
+            logger.info("Profile cache is now %d bytes", total)
@@ -1,11 +1,16 @@
 import codecs
 import collections
+import concurrent.futures
 import contextlib
 import csv
 from datetime import datetime
+import functools
+import io
 import itertools
+import json
 import logging
 import math
+import mmap
 import numpy
 import opentelemetry.trace
 import os
@@ -15,17 +20,27 @@ import prometheus_client
 import string
 import time
 import random
-import re
 import warnings
 
+from .cache import ProfileCache, hash_data, profile_cache_key
 from .numerical import mean_stddev, get_numerical_ranges
-from .profile_types import identify_types, determine_dataset_type
+from .profile_types import identify_types, determine_dataset_type, \
+    distinct_values_counts, parse_numbers, native_kind, format_values, \
+    native_values_counts, native_exp_count, native_dates
 from .spatial import LatLongColumn, Geohasher, nominatim_resolve_all, \
-    pair_latlong_columns, get_spatial_ranges, parse_wkt_column
+    pair_latlong_columns, get_spatial_ranges, parse_wkt_column, \
+    CachedGeoData, area_to_tuple, area_from_tuple
+from .streaming import count_words, profile_stream
 from .temporal import get_temporal_resolution
 from . import types
 
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
 logger = logging.getLogger(__name__)
 tracer = opentelemetry.trace.get_tracer(__name__)
 
@@ -47,6 +62,9 @@ HEADER_CONSISTENT_ROWS = 4
 
 MAX_GEOHASHES = 100
 
+LAZO_CONCURRENCY = 4
+"""Number of columns sent to the Lazo server at the same time"""
+
 
 BUCKETS = [
     1.0, 2.0, 4.0, 7.0, 12.0, 20.0, 32.0, 52.0, 80.0, 120.0, 190.0,
@@ -67,14 +85,11 @@ PROM_SPATIAL = prometheus_client.Histogram(
     buckets=BUCKETS,
 )
 PROM_LAZO = prometheus_client.Histogram(
-    'profile_lazo_seconds', "Profile time with Lazo, time",
+    'profile_lazo_seconds', "Profile time with Lazo, per column",
     buckets=BUCKETS,
 )
 
 
-_re_word_split = re.compile(r'\W+')
-
-
 csv.field_size_limit(2097152)  # Default 131072
 
 
@@ -92,6 +107,21 @@ def truncate_string(s, limit=140):
             return s[:space] + "..."
 
 
+def truncate_strings(values, limit=140):
+    """Truncate the strings of a pandas.Series, like `truncate_string()`.
+
+    Only the values over the limit are looked at individually.
+    """
+    long = values.str.len() > limit
+    if not long.any():
+        return values
+    values = values.copy()
+    values[long] = values[long].map(
+        functools.partial(truncate_string, limit=limit),
+    )
+    return values
+
+
 DELIMITERS = set(string.punctuation) | set(string.whitespace)
 UPPER = set(string.ascii_uppercase)
 LOWER = set(string.ascii_lowercase)
@@ -123,6 +153,15 @@ def expand_attribute_name(name):
     yield ''.join(word)
 
 
+def _lazo_values(data, column_idx):
+    """Get the distinct values of a column, to be sketched by Lazo.
+
+    Lazo sketches (MinHash and cardinality) only depend on the set of values,
+    so there is no need to send the duplicates over the network.
+    """
+    return pandas.unique(data.iloc[:, column_idx].values).tolist()
+
+
 def _lazo_retry(func):
     from lazo_index_service.errors import LazoError
     try:
@@ -173,8 +212,416 @@ def count_rows_to_skip(file):
         file.seek(0, 0)
 
 
-def load_data(data, load_max_size=None, indexes=True):
+CHUNK_SIZE = 1 << 20  # 1 MB
+
+SNIFF_DELIMITERS = ',\t;|'
+
+SNIFF_MIN_SIZE = 65536  # 64 kB
+"""Size of the sample to sniff the dialect from, if it has enough lines"""
+
+SNIFF_MAX_SIZE = 5242880  # 5 MB
+"""Maximum size of the sample to sniff the dialect from"""
+
+
+# Bytes that can come before the start of a field or after its end
+_FIELD_SEPARATORS = numpy.zeros(256, dtype=bool)
+_FIELD_SEPARATORS[list(b',\r\n')] = True
+
+
+def _record_ends(chunk, quotechar, quoted, prev):
+    """Find the newlines that end CSV records in a chunk of a file.
+
+    Like the CSV parser, a quote only starts a quoted value at the beginning
+    of a field, and only ends it at the end of a field, other quotes are part
+    of the value (e.g. ``12" pipe``). Escaped quotes are doubled, so only runs
+    of an odd number of quotes can start or end a quoted value.
+
+    :param quotechar: The quote character as bytes, or None if the file
+        doesn't contain any
+    :param quoted: Whether the chunk starts inside a quoted value
+    :param prev: The byte before the chunk, or a newline at the start of the
+        file. The chunk should not end with a quote, unless it is the end of
+        the file
+    :return: A tuple ``(ends, quoted)``, the positions of the newlines in the
+        chunk and whether the chunk ends inside a quoted value
+    """
+    buf = numpy.frombuffer(chunk, dtype=numpy.uint8)
+    ends = numpy.flatnonzero(buf == ord('\n'))
+    if quotechar is None:
+        return ends, quoted
+
+    # Find the runs of an odd number of quotes, as buf[starts:stops]
+    is_quote = numpy.concatenate([
+        [False],
+        buf == ord(quotechar),
+        [False],
+    ])
+    edges = numpy.flatnonzero(is_quote[1:] != is_quote[:-1])
+    starts, stops = edges[0::2], edges[1::2]
+    odd = (stops - starts) % 2 == 1
+    starts, stops = starts[odd], stops[odd]
+    if not len(starts):
+        if quoted:
+            ends = ends[:0]
+        return ends, quoted
+
+    before = buf[numpy.maximum(starts - 1, 0)]
+    before[starts == 0] = ord(prev)
+    after = buf[numpy.minimum(stops, len(buf) - 1)]
+    opens = _FIELD_SEPARATORS[before]
+    closes = _FIELD_SEPARATORS[after] | (stops == len(buf))
+
+    # A run that only opens sets the state to quoted, one that only closes
+    # sets it to unquoted, one that does both toggles it (e.g. '"""' after a
+    # comma), and one that does neither is part of an unquoted value.
+    # The state after each run is the last one set, toggled by the runs since
+    sets = numpy.flatnonzero(opens != closes)
+    last_set = numpy.full(len(starts), -1)
+    last_set[sets] = sets
+    last_set = numpy.maximum.accumulate(last_set)
+    toggles = numpy.cumsum(opens & closes)
+    state = numpy.where(
+        last_set >= 0,
+        opens[numpy.maximum(last_set, 0)],
+        quoted,
+    ).astype(numpy.int64)
+    state += toggles - numpy.where(
+        last_set >= 0,
+        toggles[numpy.maximum(last_set, 0)],
+        0,
+    )
+    state = state % 2 == 1
+
+    # State at each newline, after the runs before it
+    runs_before = numpy.searchsorted(starts, ends)
+    inside = numpy.where(
+        runs_before > 0,
+        state[numpy.maximum(runs_before - 1, 0)],
+        quoted,
+    )
+    return ends[~inside], bool(state[-1])
+
+
+def _record_chunks(fp, quotechar=None):
+    """Read a file in chunks, finding the newlines that end CSV records.
+
+    :param fp: File object, opened in binary or text mode
+    :param quotechar: If set, newlines inside quoted values don't end records
+    :return: An iterator of ``(chunk, ends)``, with the chunk as bytes (UTF-8
+        encoded if the file was opened in text mode) and the positions of the
+        newlines ending records in it
+    """
+    quoted = False  # Whether the chunk starts inside a quoted value
+    prev = b'\n'  # The byte before the chunk
+    pending = b''  # Quotes kept from the end of the previous chunk
+    while True:
+        chunk = fp.read(CHUNK_SIZE)
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        eof = not chunk
+        if quotechar is not None:
+            chunk = pending + chunk
+            if not eof:
+                # Whether quotes at the end start or end a value depends on
+                # the byte after them, keep them for the next chunk
+                cut = len(chunk.rstrip(quotechar))
+                chunk, pending = chunk[:cut], chunk[cut:]
+        if not chunk:
+            if eof:
+                return
+            continue
+        ends, quoted = _record_ends(chunk, quotechar, quoted, prev)
+        prev = chunk[-1:]
+        yield chunk, ends
+
+
+def _count_lines(fp, quotechar=None):
+    """Count the lines in a file, like ``sum(1 for _ in fp)`` but faster.
+
+    :param quotechar: If set, newlines inside quoted values are not counted,
+        this counts CSV records instead
+    """
+    nb_lines = 0
+    last = None
+    for chunk, ends in _record_chunks(fp, quotechar):
+        nb_lines += len(ends)
+        last = chunk[-1:]
+    if last is not None and last != b'\n':
+        # Last line doesn't end with a newline
+        nb_lines += 1
+    return nb_lines
+
+
+def _read_lines(fp, selected, quotechar=None):
+    """Copy only the selected lines of a file into a new buffer.
+
+    :param fp: File object, opened in binary or text mode
+    :param selected: Indexes of the lines to keep, in any order
+    :param quotechar: If set, newlines inside quoted values don't end lines,
+        so that CSV records are never split
+    :return: A ``BytesIO`` containing the selected lines, UTF-8 encoded if the
+        file was opened in text mode
+    """
+    selected = numpy.array(sorted(selected), dtype=numpy.int64)
+    output = io.BytesIO()
+    next_selected = 0  # Position in `selected` of the next line to write
+    line = 0  # Index of the line that starts at the beginning of the chunk
+    partial = b''  # Beginning of that line, from previous chunks
+    for chunk, ends in _record_chunks(fp, quotechar):
+        # Write the selected lines that end in this chunk
+        end_selected = numpy.searchsorted(selected, line + len(ends))
+        for i in selected[next_selected:end_selected] - line:
+            if i == 0:
+                output.write(partial)
+                output.write(chunk[:ends[0] + 1])
+            else:
+                output.write(chunk[ends[i - 1] + 1:ends[i] + 1])
+        next_selected = end_selected
+
+        if len(ends) == 0:
+            partial += chunk
+        else:
+            partial = chunk[ends[-1] + 1:]
+        line += len(ends)
+        if next_selected >= len(selected):
+            break
+
+    # Last line, if it doesn't end with a newline
+    if (
+        partial
+        and next_selected < len(selected)
+        and selected[next_selected] == line
+    ):
+        output.write(partial)
+
+    output.seek(0, 0)
+    return output
+
+
+class FileProbe(object):
+    """Information about a CSV file, read through a single memory map.
+
+    The size, header, dialect, rows to skip, and number of lines are each
+    found once, when first needed, instead of every stage opening and
+    scanning the file again. This can be passed to ``process_dataset()`` in
+    place of the path.
+
+    :param file: Path to the file, or file object opened in binary mode
+    """
+    def __init__(self, file):
+        if isinstance(file, (str, bytes)):
+            self.path = file
+            with open(file, 'rb') as fp:
+                self._map_file(fp)
+        else:
+            self.path = getattr(file, 'name', None)
+            self._map_file(file)
+
+    def _map_file(self, fp):
+        self.size = os.fstat(fp.fileno()).st_size
+        if self.size > 0:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # Empty files can't be mapped
+            self._map = None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _rewind(self):
+        if self._map is None:
+            return io.BytesIO(b'')
+        self._map.seek(0, 0)
+        return self._map
+
+    @functools.cached_property
+    def quotechar(self):
+        """The quote character as bytes, or None if the file has no quotes.
+
+        Only then can newlines be inside values, instead of ending lines.
+        """
+        if self._map is not None and self._map.find(b'"') != -1:
+            return b'"'
+        return None
+
+    @functools.cached_property
+    def sample(self):
+        """The beginning of the file: at least 64 kB and 3 lines, at most 5 MB.
+        """
+        if self._map is None:
+            return ''
+        end = min(self.size, SNIFF_MIN_SIZE)
+        while (
+            end < min(self.size, SNIFF_MAX_SIZE)
+            and self._map[:end].count(b'\n') < 3
+        ):
+            end = min(end + SNIFF_MIN_SIZE, self.size, SNIFF_MAX_SIZE)
+        return self._map[:end].decode('utf-8', errors='ignore')
+
+    @functools.cached_property
+    def dialect(self):
+        """The CSV dialect, as detected by `csv.Sniffer`.
+
+        Defaults to ``excel`` (comma-separated) if it can't be detected.
+        """
+        sample = self.sample
+        if sample.count('\n') >= 3:
+            try:
+                return csv.Sniffer().sniff(sample, SNIFF_DELIMITERS)
+            except csv.Error as error:
+                logger.warning("csv.Sniffer error: %s", error)
+        else:
+            logger.warning("Lines are too long to use csv.Sniffer")
+        return csv.get_dialect('excel')
+
+    @functools.cached_property
+    def header(self):
+        """The column names, from the first line read as comma-separated.
+        """
+        reader = csv.reader(codecs.getreader('utf-8')(self._rewind()))
+        try:
+            return next(reader)
+        except StopIteration:
+            return None
+
+    @functools.cached_property
+    def rows_to_skip(self):
+        """The number of non-data rows at the top, see `count_rows_to_skip()`.
+        """
+        return count_rows_to_skip(self._rewind())
+
+    @functools.cached_property
+    def nb_lines(self):
+        """The number of lines, including the header.
+
+        Newlines inside quoted values are not counted.
+        """
+        return _count_lines(self._rewind(), self.quotechar)
+
+
+def _string_dtype(arrow_strings):
+    """Get the dtype strings are loaded as.
+
+    With ``string[pyarrow]``, the values of a column are kept in a few
+    contiguous Arrow buffers rather than as one Python object each.
+
+    :param arrow_strings: Whether to use Arrow, None to use it if pyarrow is
+        installed
+    """
+    if arrow_strings is None:
+        arrow_strings = pyarrow is not None
+    if arrow_strings:
+        return pandas.StringDtype('pyarrow')
+    return str
+
+
+def _format_untyped(data, string_dtype=str):
+    """Turn the columns of a DataFrame into strings, unless typed.
+
+    Numbers, booleans, and datetimes keep their dtype, `process_column()`
+    profiles them without formatting and parsing every value.
+    """
+    def format_column(array):
+        if native_kind(array):
+            return array
+        elif array.dtype == string_dtype:
+            return array.fillna('')
+        array = format_values(array).set_axis(data.index)
+        if string_dtype is not str:
+            array = array.astype(string_dtype)
+        return array
+
+    if all(
+        native_kind(data.iloc[:, i]) or data.dtypes.iloc[i] == string_dtype
+        for i in range(data.shape[1])
+    ):
+        return data
+    return pandas.concat(
+        [format_column(data.iloc[:, i]) for i in range(data.shape[1])],
+        axis=1,
+    )
+
+
+def _load_parquet(path, load_max_size, string_dtype=str):
+    """Load a Parquet file, sampling it if it is bigger than `load_max_size`.
+
+    The number of rows and the (uncompressed) size are read from the footer.
+    If the file is too big, random row groups are read until the size is
+    reached. If even a single row group is too big, a random fraction of the
+    rows of each one is kept instead, reading the file in batches.
+
+    :param string_dtype: The dtype string columns are loaded as
+    :return: A tuple ``(data, nb_rows)``
+    """
+    import pyarrow.parquet
+
+    parquet_file = pyarrow.parquet.ParquetFile(path)
+    file_metadata = parquet_file.metadata
+    nb_rows = file_metadata.num_rows
+    sizes = [
+        file_metadata.row_group(i).total_byte_size
+        for i in range(file_metadata.num_row_groups)
+    ]
+    total_size = sum(sizes)
+    logger.info(
+        "Parquet file: %d rows, %d row groups, %d bytes uncompressed",
+        nb_rows, len(sizes), total_size,
+    )
+
+    if total_size <= load_max_size:
+        logger.info("Loading dataframe...")
+        table = parquet_file.read()
+    else:
+        rand = numpy.random.RandomState(RANDOM_SEED)
+        selected = []
+        remaining = load_max_size
+        for i in rand.permutation(len(sizes)):
+            if sizes[i] <= remaining:
+                selected.append(i)
+                remaining -= sizes[i]
+        if selected:
+            logger.info(
+                "Loading dataframe, %d/%d row groups...",
+                len(selected), len(sizes),
+            )
+            table = parquet_file.read_row_groups(sorted(selected))
+        else:
+            ratio = load_max_size / total_size
+            logger.info("Loading dataframe, sample ratio=%r...", ratio)
+            batches = []
+            for batch in parquet_file.iter_batches():
+                keep = numpy.flatnonzero(
+                    rand.random_sample(batch.num_rows) < ratio
+                )
+                batches.append(batch.take(pyarrow.array(keep)))
+            table = pyarrow.Table.from_batches(
+                batches,
+                schema=parquet_file.schema_arrow,
+            )
+
+    if string_dtype is not str:
+        # Keep the strings in Arrow buffers, instead of making Python objects
+        data = table.to_pandas(types_mapper={
+            pyarrow.string(): string_dtype,
+            pyarrow.large_string(): string_dtype,
+        }.get)
+    else:
+        data = table.to_pandas()
+    logger.info("Dataframe loaded, %d rows, %d columns",
+                data.shape[0], data.shape[1])
+    return data, nb_rows
+
+
+def load_data(data, load_max_size=None, indexes=True, arrow_strings=None):
     metadata = {}
+    string_dtype = _string_dtype(arrow_strings)
 
     if isinstance(data, pandas.DataFrame):
         if load_max_size is not None:
@@ -194,68 +641,97 @@ def load_data(data, load_max_size=None, indexes=True):
             data = data.reset_index()
 
         metadata['nb_rows'] = len(data)
-        # Change to object dtype first and do fillna() to work around bug
-        # https://github.com/pandas-dev/pandas/issues/25353 (nan as str 'nan')
-        data = data.astype(object).fillna('').astype(str)
+        data = _format_untyped(data, string_dtype)
 
         column_names = data.columns
 
-    elif data[-8:] == ".parquet" :
-        with contextlib.ExitStack() as stack:
-            data = stack.enter_context(open(data, 'rb'))
-            data = pandas.read_parquet(data)
-            metadata['nb_rows'] = len(data)
-            column_names = data.columns
-        
+    elif isinstance(data, str) and data.endswith('.parquet'):
+        if not load_max_size:
+            load_max_size = MAX_SIZE
+
+        if pyarrow is not None:
+            data, metadata['nb_rows'] = _load_parquet(
+                data, load_max_size, string_dtype,
+            )
+        else:
+            with contextlib.ExitStack() as stack:
+                data = stack.enter_context(open(data, 'rb'))
+                data = pandas.read_parquet(data)
+                metadata['nb_rows'] = len(data)
+        data = _format_untyped(data, string_dtype)
+        column_names = data.columns
+
     else:
         if not load_max_size:
             load_max_size = MAX_SIZE
 
         column_names = None  # Avoids a warning
         with contextlib.ExitStack() as stack:
-            if isinstance(data, (str, bytes)):
+            probe = None
+            if isinstance(data, FileProbe):
+                probe = data
+                data = stack.enter_context(open(probe.path, 'rb'))
+            elif isinstance(data, (str, bytes)):
                 if not os.path.exists(data):
                     raise ValueError("data file does not exist")
 
-                # File size
-                metadata['size'] = os.path.getsize(data)
-                logger.info("File size: %r bytes", metadata['size'])
-
                 data = stack.enter_context(open(data, 'rb'))
+                probe = stack.enter_context(FileProbe(data))
             elif hasattr(data, 'read'):
-                # Get size by seeking to the end
-                data.seek(0, 2)
-                metadata['size'] = data.tell()
-                data.seek(0, 0)
+                # Binary files on disk can be mapped in memory
+                if 'b' in getattr(data, 'mode', ''):
+                    try:
+                        data.fileno()
+                    except (AttributeError, OSError):
+                        pass
+                    else:
+                        probe = stack.enter_context(FileProbe(data))
             else:
                 raise TypeError("data should be a filename, a file object, or "
                                 "a pandas.DataFrame")
 
-            # Read column names
-            read_sample = data.read(4)
-            data.seek(0, 0)
-            if isinstance(read_sample, str):
-                reader = csv.reader(data)
-                try:
-                    column_names = next(reader)
-                except StopIteration:
-                    column_names = None
-                del reader
+            if probe is not None:
+                metadata['size'] = probe.size
+                column_names = probe.header
             else:
-                codec_reader = codecs.getreader('utf-8')(data)
-                reader = csv.reader(codec_reader)
-                try:
-                    column_names = next(reader)
-                except StopIteration:
-                    column_names = None
-                del reader
-                del codec_reader
+                # Get size by seeking to the end
+                data.seek(0, 2)
+                metadata['size'] = data.tell()
+                data.seek(0, 0)
+
+                # Read column names
+                read_sample = data.read(4)
+                data.seek(0, 0)
+                if isinstance(read_sample, str):
+                    reader = csv.reader(data)
+                    try:
+                        column_names = next(reader)
+                    except StopIteration:
+                        column_names = None
+                    del reader
+                else:
+                    codec_reader = codecs.getreader('utf-8')(data)
+                    reader = csv.reader(codec_reader)
+                    try:
+                        column_names = next(reader)
+                    except StopIteration:
+                        column_names = None
+                    del reader
+                    del codec_reader
             data.seek(0, 0)
+            logger.info("File size: %r bytes", metadata['size'])
 
             # Load the data
             if metadata['size'] > load_max_size:
                 logger.info("Counting rows...")
-                metadata['nb_rows'] = sum(1 for _ in data)
+                # Newlines in quoted values don't end rows. The probe knows
+                # whether the file has any quotes at all
+                if probe is not None:
+                    quotechar = probe.quotechar
+                    metadata['nb_rows'] = probe.nb_lines
+                else:
+                    quotechar = b'"'
+                    metadata['nb_rows'] = _count_lines(data, quotechar)
                 if metadata['nb_rows'] > 0:
                     metadata['average_row_size'] = (
                         metadata['size'] / metadata['nb_rows']
@@ -271,15 +747,15 @@ def load_data(data, load_max_size=None, indexes=True):
                     math.ceil(ratio * (metadata['nb_rows'] - 1)),
                 ))
                 selected_rows.add(0)  # Always get the header
+                # Only hand the selected lines to the CSV parser
                 data = pandas.read_csv(
-                    data,
-                    dtype=str, na_filter=False,
-                    skiprows=lambda i: i not in selected_rows,
+                    _read_lines(data, selected_rows, quotechar),
+                    dtype=string_dtype, na_filter=False,
                 )
             else:
                 logger.info("Loading dataframe...")
                 data = pandas.read_csv(data,
-                                       dtype=str, na_filter=False)
+                                       dtype=string_dtype, na_filter=False)
 
                 metadata['nb_rows'] = data.shape[0]
                 if metadata['nb_rows'] > 0:
@@ -301,11 +777,54 @@ def process_column(
     coverage=True,
     geo_data=None,
     nominatim=None,
+    type_sampling=False,
 ):
+    # Typed columns (numbers, booleans, datetimes) don't need to be parsed,
+    # only their distinct values are turned into strings
+    kind = native_kind(array)
+    re_count = dates = None
+
+    # Count the distinct values, so that the heuristics below only have to
+    # look at each one once
+    with tracer.start_as_current_span('profile/distinct_values'):
+        if kind is None:
+            distinct_values, distinct_counts, distinct_codes = \
+                distinct_values_counts(array, return_codes=True)
+        else:
+            native_values, distinct_counts, distinct_codes = \
+                native_values_counts(array)
+            distinct_values = format_values(native_values).to_numpy(
+                dtype=object,
+            )
+            re_count = native_exp_count(kind, native_values, distinct_counts)
+            if kind == 'M':
+                dates = native_dates(native_values, distinct_counts)
+            else:
+                dates = []
+
+    # Parse numbers once, they are used for types, statistics, and coverage
+    with tracer.start_as_current_span('profile/parse_numbers'):
+        if kind is None:
+            distinct_numbers = parse_numbers(distinct_values)
+        elif kind in ('i', 'f'):
+            distinct_numbers = numpy.asarray(
+                native_values,
+                dtype=numpy.float64,
+            )
+        else:
+            distinct_numbers = numpy.full(len(distinct_values), numpy.nan)
+
     # Identify types
     with tracer.start_as_current_span('profile/identify_types'):
         structural_type, semantic_types_dict, additional_meta = \
-            identify_types(array, column_meta['name'], geo_data, manual)
+            identify_types(
+                array, column_meta['name'], geo_data, manual,
+                distinct=(distinct_values, distinct_counts),
+                numbers=distinct_numbers,
+                re_count=re_count,
+                dates=dates,
+                type_sampling=type_sampling,
+            )
     logger.info(
         "Column type %s [%s]",
         structural_type,
@@ -332,24 +851,17 @@ def process_column(
         and (coverage or plots)
     ):
         # Get numerical values needed for either ranges or plot
-        with tracer.start_as_current_span('profile/parse_numerical_values'):
-            numerical_values = []
-            for e in array:
-                try:
-                    e = float(e)
-                except ValueError:
-                    pass
-                else:
-                    if -3.4e38 < e < 3.4e38:  # Overflows in ES
-                        numerical_values.append(e)
+        valid = (-3.4e38 < distinct_numbers) & (distinct_numbers < 3.4e38)
+        numbers = distinct_numbers[valid]  # Overflows in ES
+        numbers_counts = distinct_counts[valid]
 
         # Compute ranges from numerical values
         if coverage:
             with tracer.start_as_current_span('profile/numerical_ranges'):
                 column_meta['mean'], column_meta['stddev'] = \
-                    mean_stddev(numerical_values)
+                    mean_stddev(numbers, numbers_counts)
 
-                ranges = get_numerical_ranges(numerical_values)
+                ranges = get_numerical_ranges(numbers, numbers_counts)
                 if ranges:
                     column_meta['coverage'] = ranges
 
@@ -357,8 +869,9 @@ def process_column(
         if plots:
             with tracer.start_as_current_span('profile/numerical_plot'):
                 counts, edges = numpy.histogram(
-                    numerical_values,
+                    numbers,
                     bins=10,
+                    weights=numbers_counts,
                 )
                 counts = [int(i) for i in counts]
                 edges = [float(f) for f in edges]
@@ -374,15 +887,29 @@ def process_column(
                     ]
                 }
 
+    # Numbers are returned for latitude and longitude columns, so they can be
+    # paired without parsing them again
+    if (
+        types.LATITUDE in column_meta['semantic_types']
+        or types.LONGITUDE in column_meta['semantic_types']
+    ):
+        resolved['numbers'] = distinct_numbers[distinct_codes]
+
     if types.DATE_TIME in semantic_types_dict:
         datetimes = semantic_types_dict[types.DATE_TIME]
         resolved['datetimes'] = datetimes
-        timestamps = numpy.empty(
-            len(datetimes),
-            dtype='float32',
-        )
-        for j, dt in enumerate(datetimes):
-            timestamps[j] = dt.timestamp()
+        if isinstance(datetimes, pandas.DatetimeIndex):
+            timestamps = (
+                (datetimes - pandas.Timestamp(0, tz='UTC'))
+                / pandas.Timedelta(seconds=1)
+            ).to_numpy(dtype='float32')
+        else:
+            timestamps = numpy.empty(
+                len(datetimes),
+                dtype='float32',
+            )
+            for j, dt in enumerate(datetimes):
+                timestamps[j] = dt.timestamp()
         resolved['timestamps'] = timestamps
 
         # Compute histogram from temporal values
@@ -409,13 +936,15 @@ def process_column(
     # Compute histogram from categorical values
     if plots and types.CATEGORICAL in semantic_types_dict:
         with tracer.start_as_current_span('profile/categorical_plot'):
-            counter = collections.Counter()
-            for value in array:
-                if not value:
-                    continue
-                counter[value] += 1
-            counts = counter.most_common(5)
-            counts = sorted(counts)
+            # Stable sort, ties are kept in order of first appearance
+            non_empty = numpy.flatnonzero(distinct_values != '')
+            top = non_empty[numpy.argsort(
+                -distinct_counts[non_empty], kind='stable',
+            )[:5]]
+            counts = sorted(
+                (distinct_values[i], int(distinct_counts[i]))
+                for i in top
+            )
             column_meta['plot'] = {
                 "type": "histogram_categorical",
                 "data": [
@@ -433,13 +962,11 @@ def process_column(
         'plot' not in column_meta
     ):
         with tracer.start_as_current_span('profile/textual_plot'):
-            counter = collections.Counter()
-            for value in array:
-                for word in _re_word_split.split(value):
-                    word = word.lower()
-                    if word:
-                        counter[word] += 1
-            counts = counter.most_common(5)
+            words, counts = count_words(distinct_values, distinct_counts)
+            counts = pandas.Series(counts).groupby(words, sort=False).sum()
+            # Stable sort, ties are kept in order of first appearance
+            top = numpy.argsort(-counts.values, kind='stable')[:5]
+            counts = [(counts.index[i], int(counts.values[i])) for i in top]
             column_meta['plot'] = {
                 "type": "histogram_text",
                 "data": [
@@ -480,31 +1007,209 @@ def process_column(
     return resolved
 
 
-@PROM_LAZO.time()
-def lazo_index_data(
+# GeoData instance used by process_column() in worker processes, set up by
+# _init_worker()
+_worker_geo_data = None
+
+
+def _init_worker(geo_data_path, geo_cache=None):
+    """Initialize a worker process of the pool used by process_dataset().
+
+    GeoData holds a SQLite connection that can't be sent to other processes, so
+    each worker opens its own from the same data directory.
+
+    :param geo_cache: ``(path, size)`` if names are resolved through a
+        `CachedGeoData`. Workers share its SQLite file, if any.
+    """
+    global _worker_geo_data
+
+    if geo_data_path is not None:
+        from datamart_geo import GeoData
+
+        _worker_geo_data = GeoData(geo_data_path)
+        if geo_cache is not None:
+            _worker_geo_data = CachedGeoData(
+                _worker_geo_data,
+                geo_cache[0],
+                size=geo_cache[1],
+            )
+    else:
+        _worker_geo_data = None
+
+
+def _pack_column(array):
+    """Turn a column into an object that is efficient to send to a worker.
+
+    Using pyarrow if available, the strings are sent as a few contiguous
+    buffers rather than pickled one by one.
+    """
+    if pyarrow is not None:
+        try:
+            return pyarrow.Array.from_pandas(array), array.dtype
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+            pass
+    return array.values, None
+
+
+def _unpack_column(packed):
+    packed, dtype = packed
+    if pyarrow is not None and isinstance(packed, pyarrow.Array):
+        if isinstance(dtype, pandas.StringDtype):
+            # Strings stay in the Arrow buffers
+            return packed.to_pandas(types_mapper={packed.type: dtype}.get)
+        return packed.to_pandas()
+    return pandas.Series(packed)
+
+
+def _process_column_worker(packed, column_meta, kwargs):
+    """Run process_column() in a worker process.
+
+    Returns the updated column metadata and the resolved values, with the
+    administrative areas turned into tuples since they can't be pickled.
+    """
+    resolved = process_column(
+        _unpack_column(packed), column_meta,
+        geo_data=_worker_geo_data,
+        **kwargs,
+    )
+    if 'admin_areas' in resolved:
+        resolved['admin_areas'] = [
+            None if area is None else area_to_tuple(area)
+            for area in resolved['admin_areas']
+        ]
+    return column_meta, resolved
+
+
+def process_columns_parallel(
+    data, columns, manual_columns, workers,
+    *,
+    geo_data=None,
+    **kwargs
+):
+    """Run process_column() over all columns using a pool of processes.
+
+    This returns the same thing as calling process_column() on each column in
+    order, the metadata dicts in `columns` are updated in place.
+
+    :param data: The DataFrame
+    :param columns: List of column metadata dicts
+    :param manual_columns: Manual annotations, as a dict from column name
+    :param workers: Number of worker processes
+    :param geo_data: datamart_geo.GeoData instance, that will be opened again
+        in each worker
+    :return: Dict of resolved values for each column index
+    """
+    if geo_data is not None:
+        geo_data_path = geo_data._data_path
+    else:
+        geo_data_path = None
+    if isinstance(geo_data, CachedGeoData):
+        geo_cache = geo_data.path, geo_data.size
+    else:
+        geo_cache = None
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(geo_data_path, geo_cache),
+    ) as executor:
+        futures = []
+        for column_idx, column_meta in enumerate(columns):
+            futures.append(executor.submit(
+                _process_column_worker,
+                _pack_column(data.iloc[:, column_idx]),
+                column_meta,
+                dict(kwargs, manual=manual_columns.get(column_meta['name'])),
+            ))
+
+        # Collect results in column order, so the output doesn't depend on
+        # which worker finishes first
+        resolved_columns = {}
+        for column_idx, future in enumerate(futures):
+            column_meta, resolved = future.result()
+            columns[column_idx].update(column_meta)
+            if 'admin_areas' in resolved:
+                resolved['admin_areas'] = [
+                    None if area is None
+                    else area_from_tuple(geo_data, area)
+                    for area in resolved['admin_areas']
+                ]
+            resolved_columns[column_idx] = resolved
+
+    return resolved_columns
+
+
+def _lazo_column(data, column_idx, call):
+    values = _lazo_values(data, column_idx)
+    with PROM_LAZO.time():
+        return _lazo_retry(lambda: call(values))
+
+
+def lazo_submit_all(
+    executor,
     data,
     dataset_id,
     columns_textual, column_textual_names,
     lazo_client,
+    search=False,
 ):
-    logger.info("Indexing textual data with Lazo...")
-    start = time.perf_counter()
+    """Send all the textual columns to Lazo, from threads.
+
+    :param executor: The `concurrent.futures.Executor` to run the calls in
+    :param search: If True, get the sketches of the columns, otherwise index
+        them
+    :return: A list of futures, one per column
+    """
+    futures = []
     for idx, name in zip(columns_textual, column_textual_names):
-        def call_lazo():
-            lazo_client.index_data(
-                data.iloc[:, idx].values.tolist(),
-                dataset_id,
-                name,
-            )
+        if search:
+            def call(values, name=name):
+                return lazo_client.get_lazo_sketch_from_data(
+                    values,
+                    "",
+                    name,
+                )
+        else:
+            def call(values, name=name):
+                lazo_client.index_data(
+                    values,
+                    dataset_id,
+                    name,
+                )
+
+        futures.append(executor.submit(_lazo_column, data, idx, call))
+    return futures
+
 
-        _lazo_retry(call_lazo)
+def _lazo_wait_all(futures, start, what):
+    results = [future.result() for future in futures]
     logger.info(
-        "Indexing with Lazo took %.2fs seconds",
+        "%s with Lazo took %.2fs seconds",
+        what,
         time.perf_counter() - start,
     )
+    return results
+
+
+def lazo_index_data(
+    data,
+    dataset_id,
+    columns_textual, column_textual_names,
+    lazo_client,
+):
+    logger.info("Indexing textual data with Lazo...")
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(LAZO_CONCURRENCY) as executor:
+        futures = lazo_submit_all(
+            executor,
+            data,
+            dataset_id,
+            columns_textual, column_textual_names,
+            lazo_client,
+        )
+    _lazo_wait_all(futures, start, "Indexing")
 
 
-@PROM_LAZO.time()
 def get_lazo_data_sketch(
     data,
     columns_textual, column_textual_names,
@@ -512,21 +1217,25 @@ def get_lazo_data_sketch(
 ):
     logger.info("Sketching textual data with Lazo...")
     start = time.perf_counter()
-    lazo_sketches = []
-    for idx, name in zip(columns_textual, column_textual_names):
-        def call_lazo():
-            return lazo_client.get_lazo_sketch_from_data(
-                data.iloc[:, idx].values.tolist(),
-                "",
-                name,
-            )
+    with concurrent.futures.ThreadPoolExecutor(LAZO_CONCURRENCY) as executor:
+        futures = lazo_submit_all(
+            executor,
+            data,
+            None,
+            columns_textual, column_textual_names,
+            lazo_client,
+            search=True,
+        )
+    return _lazo_wait_all(futures, start, "Sketching")
 
-        lazo_sketches.append(_lazo_retry(call_lazo))
-    logger.info(
-        "Sketching with Lazo took %.2fs seconds",
-        time.perf_counter() - start,
-    )
-    return lazo_sketches
+
+def _column_numbers(data, column_idx, resolved_columns):
+    """Get a column as numbers, reusing the ones from `process_column()`.
+    """
+    numbers = resolved_columns.get(column_idx, {}).get('numbers')
+    if numbers is None:
+        numbers = parse_numbers(data.iloc[:, column_idx])
+    return numbers
 
 
 @PROM_PROFILE.time()
@@ -534,16 +1243,19 @@ def process_dataset(data, dataset_id=None, metadata=None,
                     lazo_client=None, nominatim=None, geo_data=None,
                     search=False, include_sample=False,
                     coverage=True, plots=False, indexes=True,
-                    load_max_size=None,
+                    load_max_size=None, workers=None, streaming=False,
+                    arrow_strings=None, cache=None, type_sampling=False,
                     **kwargs):
     """Compute all metafeatures from a dataset.
 
-    :param data: path to dataset, or file object, or DataFrame
+    :param data: path to dataset, or file object, or DataFrame, or a
+        `FileProbe`
     :param dataset_id: id of the dataset
     :param metadata: The metadata provided by the discovery plugin (might be
         very limited).
     :param lazo_client: client for the Lazo Index Server
-    :param nominatim: URL of the Nominatim server
+    :param nominatim: URL of the Nominatim server, or a
+        `spatial.NominatimClient`
     :param geo_data: ``True`` or a datamart_geo.GeoData instance to use to
         resolve named administrative territorial entities
     :param search: True if this method is being called during the search
@@ -558,6 +1270,27 @@ def process_dataset(data, dataset_id=None, metadata=None,
     :param load_max_size: Target size of the data to be analyzed. The data will
         be randomly sampled if it is bigger. Defaults to `MAX_SIZE`, currently
         5 MB. This is different from the sample data included in the result.
+    :param workers: Number of processes to use to profile columns in
+        parallel. By default, columns are profiled one after the other in the
+        current process.
+    :param streaming: If True and the file is bigger than `load_max_size`,
+        types are still detected on a sample, but the whole file is then read
+        again in chunks to compute the distinct counts, statistics, ranges,
+        plots and coverage over all the rows, using bounded memory.
+        Coverage from addresses and administrative areas still comes from the
+        sample.
+    :param arrow_strings: Whether to load strings as ``string[pyarrow]``,
+        using a lot less memory than Python objects. By default, this is done
+        if pyarrow is installed.
+    :param cache: Where to keep profiles, so that profiling the same data
+        again with the same options only costs hashing it. This is a
+        directory, a `cache.ProfileCache`, or a dict-like object mapping keys
+        to JSON strings. Not used when indexing into Lazo.
+    :param type_sampling: If True, the structure of the values (integer,
+        float, ...) is first detected on a random sample of each column, and
+        the whole column is only looked at if the sample is not conclusive.
+        Counts such as the unclean values ratio are then estimates. Each
+        column's ``type_detection`` is ``'sample'`` or ``'full'``.
     :return: JSON structure (dict)
     """
     if 'sample_size' in kwargs:
@@ -580,12 +1313,45 @@ def process_dataset(data, dataset_id=None, metadata=None,
     if metadata is None:
         metadata = {}
 
+    # Look for the profile in the cache
+    cache_key = None
+    if cache is not None and not (lazo_client and not search):
+        if isinstance(cache, str):
+            cache = ProfileCache(cache)
+        with tracer.start_as_current_span('profile/cache'):
+            cache_key = profile_cache_key(
+                hash_data(data.path if isinstance(data, FileProbe) else data),
+                {
+                    'metadata': metadata,
+                    'lazo': lazo_client is not None,
+                    'nominatim': nominatim is not None,
+                    'geo_data': geo_data is not None,
+                    'search': search,
+                    'include_sample': include_sample,
+                    'coverage': coverage,
+                    'plots': plots,
+                    'indexes': indexes,
+                    'load_max_size': load_max_size,
+                    'streaming': streaming,
+                    'type_sampling': type_sampling,
+                },
+            )
+            cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info("Found profile in cache")
+            metadata.update(json.loads(cached))
+            return metadata
+
+    # Keep the input around if we need to read it again in streaming mode
+    source = data.path if isinstance(data, FileProbe) else data
+
     # Load or prepare data for processing
     try:
         data, file_metadata, column_names = load_data(
             data,
             load_max_size=load_max_size,
             indexes=indexes,
+            arrow_strings=arrow_strings,
         )
     except EmptyDataError:
         logger.warning("Dataframe is empty!")
@@ -627,7 +1393,8 @@ def process_dataset(data, dataset_id=None, metadata=None,
             }
 
     # Cache some values that have been resolved for type identification but are
-    # useful for spatial coverage computation: admin areas and addresses
+    # useful for spatial coverage computation: admin areas, addresses, and
+    # latitude/longitude numbers
     # Having to resolve them once to see if they're valid and a second time to
     # build coverage information would be too slow
     resolved_columns = {}
@@ -636,24 +1403,36 @@ def process_dataset(data, dataset_id=None, metadata=None,
     logger.info("Identifying types, %d columns...", len(columns))
     with PROM_TYPES.time():
         with tracer.start_as_current_span('profile/columns'):
-            for column_idx, column_meta in enumerate(columns):
-                name = column_meta['name']
-                with tracer.start_as_current_span('profile/column', attributes={'idx': column_idx, 'name': name}):
-                    logger.info("Processing column %d %r...", column_idx, name)
-                    array = data.iloc[:, column_idx]
-                    if name in manual_columns:
-                        manual = manual_columns[name]
-                    else:
-                        manual = None
-                    # Process the column, updating the column_meta dict
-                    resolved_columns[column_idx] = process_column(
-                        array, column_meta,
-                        manual=manual,
-                        plots=plots,
-                        coverage=coverage,
-                        geo_data=geo_data,
-                        nominatim=nominatim,
-                    )
+            if workers is not None and workers > 1 and len(columns) > 1:
+                logger.info("Using %d worker processes", workers)
+                resolved_columns = process_columns_parallel(
+                    data, columns, manual_columns, workers,
+                    plots=plots,
+                    coverage=coverage,
+                    geo_data=geo_data,
+                    nominatim=nominatim,
+                    type_sampling=type_sampling,
+                )
+            else:
+                for column_idx, column_meta in enumerate(columns):
+                    name = column_meta['name']
+                    with tracer.start_as_current_span('profile/column', attributes={'idx': column_idx, 'name': name}):
+                        logger.info("Processing column %d %r...", column_idx, name)
+                        array = data.iloc[:, column_idx]
+                        if name in manual_columns:
+                            manual = manual_columns[name]
+                        else:
+                            manual = None
+                        # Process the column, updating the column_meta dict
+                        resolved_columns[column_idx] = process_column(
+                            array, column_meta,
+                            manual=manual,
+                            plots=plots,
+                            coverage=coverage,
+                            geo_data=geo_data,
+                            nominatim=nominatim,
+                            type_sampling=type_sampling,
+                        )
 
     # Textual columns
     columns_textual = [
@@ -664,311 +1443,355 @@ def process_dataset(data, dataset_id=None, metadata=None,
             and types.DATE_TIME not in col['semantic_types']
         )
     ]
+    lazo_executor = lazo_futures = None
     if lazo_client and columns_textual:
-        with tracer.start_as_current_span('profile/categorical'):
-            # Indexing with lazo
-            column_textual_names = [columns[idx]['name'] for idx in columns_textual]
-            if not search:
-                try:
-                    lazo_index_data(
-                        data,
-                        dataset_id,
-                        columns_textual, column_textual_names,
-                        lazo_client,
-                    )
-                except Exception:
-                    logger.warning("Error indexing textual attributes from %s", dataset_id)
-                    raise
-            else:
-                try:
-                    lazo_sketches = get_lazo_data_sketch(
-                        data,
-                        columns_textual, column_textual_names,
-                        lazo_client,
-                    )
-                except Exception:
-                    logger.warning("Error getting Lazo sketches")
-                    raise
-                else:
-                    # saving sketches into metadata
-                    for sketch, idx in zip(lazo_sketches, columns_textual):
-                        n_permutations, hash_values, cardinality = sketch
-                        columns[idx]['lazo'] = dict(
-                            n_permutations=n_permutations,
-                            hash_values=list(hash_values),
-                            cardinality=cardinality,
-                        )
-
-    # Pair lat & long columns
-    columns_lat = [
-        LatLongColumn(
-            index=col_idx,
-            name=col['name'],
-            annot_pair=manual_columns.get(col['name'], {}).get('latlong_pair'),
+        # Send the columns to Lazo from threads, while the rest is computed
+        logger.info(
+            "%s textual data with Lazo...",
+            "Sketching" if search else "Indexing",
         )
-        for col_idx, col in enumerate(columns)
-        if types.LATITUDE in col['semantic_types']
-    ]
-    columns_long = [
-        LatLongColumn(
-            index=col_idx,
-            name=col['name'],
-            annot_pair=manual_columns.get(col['name'], {}).get('latlong_pair'),
+        lazo_start = time.perf_counter()
+        column_textual_names = [columns[idx]['name'] for idx in columns_textual]
+        lazo_executor = concurrent.futures.ThreadPoolExecutor(LAZO_CONCURRENCY)
+        lazo_futures = lazo_submit_all(
+            lazo_executor,
+            data,
+            dataset_id,
+            columns_textual, column_textual_names,
+            lazo_client,
+            search=search,
         )
-        for col_idx, col in enumerate(columns)
-        if types.LONGITUDE in col['semantic_types']
-    ]
-    latlong_pairs, (missed_lat, missed_long) = \
-        pair_latlong_columns(columns_lat, columns_long)
 
-    # Log missed columns
-    if missed_lat:
-        logger.warning("Unmatched latitude columns: %r", missed_lat)
-    if missed_long:
-        logger.warning("Unmatched longitude columns: %r", missed_long)
-
-    # Remove semantic type from unpaired columns
-    for col in columns:
-        if col['name'] in missed_lat:
-            col['semantic_types'].remove(types.LATITUDE)
-        if col['name'] in missed_long:
-            col['semantic_types'].remove(types.LONGITUDE)
-
-    # Identify the overall dataset types (numerical, categorical, spatial, or temporal)
-    dataset_types = collections.Counter()
-    for column_meta in columns:
-        dataset_type = determine_dataset_type(
-            column_meta['structural_type'],
-            column_meta['semantic_types'],
-        )
-        if dataset_type:
-            dataset_types[dataset_type] += 1
-    for key, d_type in [
-        ('nb_spatial_columns', types.DATASET_SPATIAL),
-        ('nb_temporal_columns', types.DATASET_TEMPORAL),
-        ('nb_categorical_columns', types.DATASET_CATEGORICAL),
-        ('nb_numerical_columns', types.DATASET_NUMERICAL),
-    ]:
-        if dataset_types[d_type]:
-            metadata[key] = dataset_types[d_type]
-    metadata['types'] = sorted(set(dataset_types))
-
-    if coverage:
-        logger.info("Computing spatial coverage...")
-        spatial_coverage = []
-        with PROM_SPATIAL.time():
-            with tracer.start_as_current_span('profile/spatial_coverage'):
-                # Compute sketches from lat/long pairs
-                for col_lat, col_long in latlong_pairs:
-                    lat_values = data.iloc[:, col_lat.index]
-                    lat_values = pandas.to_numeric(lat_values, errors='coerce')
-                    long_values = data.iloc[:, col_long.index]
-                    long_values = pandas.to_numeric(long_values, errors='coerce')
-                    mask = (
-                        ~numpy.isnan(lat_values)
-                        & ~numpy.isnan(long_values)
-                        & (-90.0 < lat_values) & (lat_values < 90.0)
-                        & (-180.0 < long_values) & (long_values < 180.0)
-                    )
+    try:
+        # Pair lat & long columns
+        columns_lat = [
+            LatLongColumn(
+                index=col_idx,
+                name=col['name'],
+                annot_pair=manual_columns.get(col['name'], {}).get('latlong_pair'),
+            )
+            for col_idx, col in enumerate(columns)
+            if types.LATITUDE in col['semantic_types']
+        ]
+        columns_long = [
+            LatLongColumn(
+                index=col_idx,
+                name=col['name'],
+                annot_pair=manual_columns.get(col['name'], {}).get('latlong_pair'),
+            )
+            for col_idx, col in enumerate(columns)
+            if types.LONGITUDE in col['semantic_types']
+        ]
+        latlong_pairs, (missed_lat, missed_long) = \
+            pair_latlong_columns(columns_lat, columns_long)
+
+        # Log missed columns
+        if missed_lat:
+            logger.warning("Unmatched latitude columns: %r", missed_lat)
+        if missed_long:
+            logger.warning("Unmatched longitude columns: %r", missed_long)
+
+        # Remove semantic type from unpaired columns
+        for col in columns:
+            if col['name'] in missed_lat:
+                col['semantic_types'].remove(types.LATITUDE)
+            if col['name'] in missed_long:
+                col['semantic_types'].remove(types.LONGITUDE)
+
+        # Identify the overall dataset types (numerical, categorical, spatial, or temporal)
+        dataset_types = collections.Counter()
+        for column_meta in columns:
+            dataset_type = determine_dataset_type(
+                column_meta['structural_type'],
+                column_meta['semantic_types'],
+            )
+            if dataset_type:
+                dataset_types[dataset_type] += 1
+        for key, d_type in [
+            ('nb_spatial_columns', types.DATASET_SPATIAL),
+            ('nb_temporal_columns', types.DATASET_TEMPORAL),
+            ('nb_categorical_columns', types.DATASET_CATEGORICAL),
+            ('nb_numerical_columns', types.DATASET_NUMERICAL),
+        ]:
+            if dataset_types[d_type]:
+                metadata[key] = dataset_types[d_type]
+        metadata['types'] = sorted(set(dataset_types))
 
-                    if mask.any():
-                        lat_values = lat_values[mask]
-                        long_values = long_values[mask]
-                        values = numpy.array([lat_values, long_values]).T
-                        logger.info(
-                            "Computing spatial sketch lat=%r long=%r (%d rows)",
-                            col_lat.name, col_long.name, len(values),
-                        )
-                        # Ranges
-                        spatial_ranges = get_spatial_ranges(values)
-                        # Geohashes
-                        builder = Geohasher(number=MAX_GEOHASHES)
-                        builder.add_points(values)
-                        hashes = builder.get_hashes_json()
-
-                        spatial_coverage.append({
-                            'type': 'latlong',
-                            'column_names': [col_lat.name, col_long.name],
-                            'column_indexes': [
-                                col_lat.index,
-                                col_long.index,
-                            ],
-                            'geohashes4': hashes,
-                            'ranges': spatial_ranges,
-                            'number': len(values),
-                        })
-
-                # Compute sketches from WKT points
-                for i, col in enumerate(columns):
-                    if col['structural_type'] != types.GEO_POINT:
-                        continue
-                    latlong = col.get('point_format') == 'lat,long'
-                    name = col['name']
-                    values = parse_wkt_column(
-                        data.iloc[:, i],
-                        latlong=latlong,
-                    )
-                    total = numpy.sum(data.iloc[:, i].apply(lambda x: bool(x)))
-                    if len(values) < 0.5 * total:
-                        logger.warning(
-                            "Most data points did not parse correctly as "
-                            "point (%s) col=%d %r",
-                            'lat,long' if latlong else 'long,lat',
-                            i, col,
-                        )
-                    if values:
-                        logger.info(
-                            "Computing spatial sketches point=%r (%d rows)",
-                            name, len(values),
+        if coverage:
+            logger.info("Computing spatial coverage...")
+            spatial_coverage = []
+            with PROM_SPATIAL.time():
+                with tracer.start_as_current_span('profile/spatial_coverage'):
+                    # Compute sketches from lat/long pairs
+                    for col_lat, col_long in latlong_pairs:
+                        lat_values = _column_numbers(
+                            data, col_lat.index, resolved_columns,
                         )
-                        # Ranges
-                        spatial_ranges = get_spatial_ranges(values)
-                        # Geohashes
-                        builder = Geohasher(number=MAX_GEOHASHES)
-                        builder.add_points(values)
-                        hashes = builder.get_hashes_json()
-
-                        spatial_coverage.append({
-                            'type': 'point_latlong' if latlong else 'point',
-                            'column_names': [name],
-                            'column_indexes': [i],
-                            'geohashes4': hashes,
-                            'ranges': spatial_ranges,
-                            'number': len(values),
-                        })
-
-                for idx, resolved in resolved_columns.items():
-                    # Compute sketches from addresses
-                    if 'addresses' in resolved:
-                        locations = resolved['addresses']
-
-                        name = columns[idx]['name']
-                        logger.info(
-                            "Computing spatial sketches address=%r (%d rows)",
-                            name, len(locations),
+                        long_values = _column_numbers(
+                            data, col_long.index, resolved_columns,
                         )
-                        # Ranges
-                        spatial_ranges = get_spatial_ranges(locations)
-                        # Geohashes
-                        builder = Geohasher(number=MAX_GEOHASHES)
-                        builder.add_points(locations)
-                        hashes = builder.get_hashes_json()
-
-                        spatial_coverage.append({
-                            'type': 'address',
-                            'column_names': [name],
-                            'column_indexes': [idx],
-                            'geohashes4': hashes,
-                            'ranges': spatial_ranges,
-                            'number': len(locations),
-                        })
-
-                    # Compute sketches from administrative areas
-                    if 'admin_areas' in resolved:
-                        areas = resolved['admin_areas']
-
-                        name = columns[idx]['name']
-                        logger.info(
-                            "Computing spatial sketches admin_areas=%r (%d rows)",
-                            name, len(areas),
+                        mask = (
+                            ~numpy.isnan(lat_values)
+                            & ~numpy.isnan(long_values)
+                            & (-90.0 < lat_values) & (lat_values < 90.0)
+                            & (-180.0 < long_values) & (long_values < 180.0)
                         )
-                        cov = {
-                            'type': 'admin',
-                            'column_names': [name],
-                            'column_indexes': [idx],
-                        }
 
-                        # Merge into a single range
-                        merged = None
-                        for area in areas:
-                            if area is None:
-                                continue
-                            new = area.bounds
-                            if new:
-                                if merged is None:
-                                    merged = new
-                                else:
-                                    merged = (
-                                        min(merged[0], new[0]),
-                                        max(merged[1], new[1]),
-                                        min(merged[2], new[2]),
-                                        max(merged[3], new[3]),
-                                    )
-                        if (
-                            merged is not None
-                            and merged[1] - merged[0] > 0.01
-                            and merged[3] - merged[2] > 0.01
-                        ):
-                            logger.info("Computed bounding box")
-                            cov['ranges'] = [
-                                {
-                                    'range': {
-                                        'type': 'envelope',
-                                        'coordinates': [
-                                            [merged[0], merged[3]],
-                                            [merged[1], merged[2]],
-                                        ],
+                        if mask.any():
+                            lat_values = lat_values[mask]
+                            long_values = long_values[mask]
+                            values = numpy.array([lat_values, long_values]).T
+                            logger.info(
+                                "Computing spatial sketch lat=%r long=%r (%d rows)",
+                                col_lat.name, col_long.name, len(values),
+                            )
+                            # Ranges
+                            spatial_ranges = get_spatial_ranges(values)
+                            # Geohashes
+                            builder = Geohasher(number=MAX_GEOHASHES)
+                            builder.add_points(values)
+                            hashes = builder.get_hashes_json()
+
+                            spatial_coverage.append({
+                                'type': 'latlong',
+                                'column_names': [col_lat.name, col_long.name],
+                                'column_indexes': [
+                                    col_lat.index,
+                                    col_long.index,
+                                ],
+                                'geohashes4': hashes,
+                                'ranges': spatial_ranges,
+                                'number': len(values),
+                            })
+
+                    # Compute sketches from WKT points
+                    for i, col in enumerate(columns):
+                        if col['structural_type'] != types.GEO_POINT:
+                            continue
+                        latlong = col.get('point_format') == 'lat,long'
+                        name = col['name']
+                        values = parse_wkt_column(
+                            data.iloc[:, i],
+                            latlong=latlong,
+                        )
+                        total = (data.iloc[:, i].str.len() > 0).sum()
+                        if len(values) < 0.5 * total:
+                            logger.warning(
+                                "Most data points did not parse correctly as "
+                                "point (%s) col=%d %r",
+                                'lat,long' if latlong else 'long,lat',
+                                i, col,
+                            )
+                        if len(values):
+                            logger.info(
+                                "Computing spatial sketches point=%r (%d rows)",
+                                name, len(values),
+                            )
+                            # Ranges
+                            spatial_ranges = get_spatial_ranges(values)
+                            # Geohashes
+                            builder = Geohasher(number=MAX_GEOHASHES)
+                            builder.add_points(values)
+                            hashes = builder.get_hashes_json()
+
+                            spatial_coverage.append({
+                                'type': 'point_latlong' if latlong else 'point',
+                                'column_names': [name],
+                                'column_indexes': [i],
+                                'geohashes4': hashes,
+                                'ranges': spatial_ranges,
+                                'number': len(values),
+                            })
+
+                    for idx, resolved in resolved_columns.items():
+                        # Compute sketches from addresses
+                        if 'addresses' in resolved:
+                            locations = resolved['addresses']
+
+                            name = columns[idx]['name']
+                            logger.info(
+                                "Computing spatial sketches address=%r (%d rows)",
+                                name, len(locations),
+                            )
+                            # Ranges
+                            spatial_ranges = get_spatial_ranges(locations)
+                            # Geohashes
+                            builder = Geohasher(number=MAX_GEOHASHES)
+                            builder.add_points(locations)
+                            hashes = builder.get_hashes_json()
+
+                            spatial_coverage.append({
+                                'type': 'address',
+                                'column_names': [name],
+                                'column_indexes': [idx],
+                                'geohashes4': hashes,
+                                'ranges': spatial_ranges,
+                                'number': len(locations),
+                            })
+
+                        # Compute sketches from administrative areas
+                        if 'admin_areas' in resolved:
+                            areas = resolved['admin_areas']
+
+                            name = columns[idx]['name']
+                            logger.info(
+                                "Computing spatial sketches admin_areas=%r (%d rows)",
+                                name, len(areas),
+                            )
+                            cov = {
+                                'type': 'admin',
+                                'column_names': [name],
+                                'column_indexes': [idx],
+                            }
+
+                            # Merge into a single range
+                            merged = None
+                            for area in areas:
+                                if area is None:
+                                    continue
+                                new = area.bounds
+                                if new:
+                                    if merged is None:
+                                        merged = new
+                                    else:
+                                        merged = (
+                                            min(merged[0], new[0]),
+                                            max(merged[1], new[1]),
+                                            min(merged[2], new[2]),
+                                            max(merged[3], new[3]),
+                                        )
+                            if (
+                                merged is not None
+                                and merged[1] - merged[0] > 0.01
+                                and merged[3] - merged[2] > 0.01
+                            ):
+                                logger.info("Computed bounding box")
+                                cov['ranges'] = [
+                                    {
+                                        'range': {
+                                            'type': 'envelope',
+                                            'coordinates': [
+                                                [merged[0], merged[3]],
+                                                [merged[1], merged[2]],
+                                            ],
+                                        },
                                     },
-                                },
-                            ]
-                        else:
-                            logger.info("Couldn't build a bounding box")
-
-                        # Compute geohashes
-                        builder = Geohasher(number=MAX_GEOHASHES)
-                        for area in areas:
-                            if area is None or not area.bounds:
-                                continue
-                            builder.add_aab(area.bounds)
-                        hashes = builder.get_hashes_json()
-                        if hashes:
-                            cov['geohashes4'] = hashes
-
-                        # Count
-                        cov['number'] = builder.total
-
-                        if 'ranges' in cov or 'geohashes4' in cov:
-                            spatial_coverage.append(cov)
-
-        if spatial_coverage:
-            metadata['spatial_coverage'] = spatial_coverage
-
-        logger.info("Computing temporal coverage...")
-        temporal_coverage = []
-
-        with tracer.start_as_current_span('profile/temporal_coverage'):
-            # Datetime columns
-            for idx, col in enumerate(columns):
-                if types.DATE_TIME not in col['semantic_types']:
-                    continue
-                datetimes = resolved_columns[idx]['datetimes']
-                timestamps = resolved_columns[idx]['timestamps']
-                logger.info(
-                    "Computing temporal ranges datetime=%r (%d rows)",
-                    col['name'], len(datetimes),
-                )
+                                ]
+                            else:
+                                logger.info("Couldn't build a bounding box")
+
+                            # Compute geohashes
+                            builder = Geohasher(number=MAX_GEOHASHES)
+                            for area in areas:
+                                if area is None or not area.bounds:
+                                    continue
+                                builder.add_aab(area.bounds)
+                            hashes = builder.get_hashes_json()
+                            if hashes:
+                                cov['geohashes4'] = hashes
+
+                            # Count
+                            cov['number'] = builder.total
+
+                            if 'ranges' in cov or 'geohashes4' in cov:
+                                spatial_coverage.append(cov)
+
+            if spatial_coverage:
+                metadata['spatial_coverage'] = spatial_coverage
+
+            logger.info("Computing temporal coverage...")
+            temporal_coverage = []
+
+            with tracer.start_as_current_span('profile/temporal_coverage'):
+                # Datetime columns
+                for idx, col in enumerate(columns):
+                    if types.DATE_TIME not in col['semantic_types']:
+                        continue
+                    datetimes = resolved_columns[idx]['datetimes']
+                    timestamps = resolved_columns[idx]['timestamps']
+                    logger.info(
+                        "Computing temporal ranges datetime=%r (%d rows)",
+                        col['name'], len(datetimes),
+                    )
+
+                    # Get temporal ranges
+                    ranges = get_numerical_ranges(timestamps)
+                    if not ranges:
+                        continue
+
+                    # Get temporal resolution
+                    resolution = get_temporal_resolution(datetimes)
 
-                # Get temporal ranges
-                ranges = get_numerical_ranges(timestamps)
-                if not ranges:
-                    continue
+                    temporal_coverage.append({
+                        'type': 'datetime',
+                        'column_names': [col['name']],
+                        'column_indexes': [idx],
+                        'column_types': [types.DATE_TIME],
+                        'ranges': ranges,
+                        'temporal_resolution': resolution,
+                    })
 
-                # Get temporal resolution
-                resolution = get_temporal_resolution(datetimes)
+                # TODO: Times split over multiple columns
 
-                temporal_coverage.append({
-                    'type': 'datetime',
-                    'column_names': [col['name']],
-                    'column_indexes': [idx],
-                    'column_types': [types.DATE_TIME],
-                    'ranges': ranges,
-                    'temporal_resolution': resolution,
-                })
+            if temporal_coverage:
+                metadata['temporal_coverage'] = temporal_coverage
 
-            # TODO: Times split over multiple columns
+        # Go over the whole file
+        if (
+            streaming
+            and not isinstance(source, pandas.DataFrame)
+            and metadata.get('size', 0) > (load_max_size or MAX_SIZE)
+        ):
+            logger.info("Profiling whole file in streaming mode...")
+            with tracer.start_as_current_span('profile/streaming'):
+                with contextlib.ExitStack() as stack:
+                    if isinstance(source, (str, bytes)):
+                        source = stack.enter_context(open(source, 'rb'))
+                    else:
+                        source.seek(0, 0)
+                    profile_stream(
+                        source, metadata,
+                        chunk_rows=max(
+                            1000,
+                            int(
+                                (load_max_size or MAX_SIZE)
+                                / metadata['average_row_size']
+                            ),
+                        ),
+                        max_geohashes=MAX_GEOHASHES,
+                        string_dtype=_string_dtype(arrow_strings),
+                    )
 
-        if temporal_coverage:
-            metadata['temporal_coverage'] = temporal_coverage
+        # Wait for Lazo
+        if lazo_futures is not None:
+            with tracer.start_as_current_span('profile/categorical'):
+                if not search:
+                    try:
+                        _lazo_wait_all(lazo_futures, lazo_start, "Indexing")
+                    except Exception:
+                        logger.warning("Error indexing textual attributes from %s", dataset_id)
+                        raise
+                else:
+                    try:
+                        lazo_sketches = _lazo_wait_all(
+                            lazo_futures, lazo_start, "Sketching",
+                        )
+                    except Exception:
+                        logger.warning("Error getting Lazo sketches")
+                        raise
+                    else:
+                        # saving sketches into metadata
+                        for sketch, idx in zip(lazo_sketches, columns_textual):
+                            n_permutations, hash_values, cardinality = sketch
+                            columns[idx]['lazo'] = dict(
+                                n_permutations=n_permutations,
+                                hash_values=list(hash_values),
+                                cardinality=cardinality,
+                            )
+    finally:
+        if lazo_executor is not None:
+            # Don't keep calling Lazo for a dataset that failed
+            lazo_executor.shutdown(wait=True, cancel_futures=True)
 
     # Attribute names
     attribute_keywords = []
@@ -990,9 +1813,17 @@ def process_dataset(data, dataset_id=None, metadata=None,
             )
             choose_rows.sort()  # Keep it in order
             sample = data.iloc[choose_rows]
-            sample = sample.applymap(truncate_string)  # Truncate long values
+            sample = sample.apply(format_values)  # Typed columns
+            sample = sample.apply(truncate_strings)  # Truncate long values
             metadata['sample'] = sample.to_csv(index=False, line_terminator='\r\n')
 
+    if cache_key is not None:
+        cache[cache_key] = json.dumps(
+            metadata,
+            # Compact
+            sort_keys=True, indent=None, separators=(',', ':'),
+        )
+
     # Return it -- it will be inserted into Elasticsearch, and published to the
     # feed and the waiting on-demand searches
     return metadata
@@ -1,10 +1,6 @@
 import logging
 import math
 import numpy
-from sklearn.cluster import KMeans
-from sklearn.exceptions import ConvergenceWarning
-
-from .warning_tools import ignore_warnings
 
 
 logger = logging.getLogger(__name__)
@@ -14,69 +10,198 @@ N_RANGES = 3
 MIN_RANGE_SIZE = 0.1  # 10%
 
 
-def mean_stddev(array):
+def mean_stddev(array, counts=None):
     """Compute the mean (average) and standard deviation of a numerical array.
+
+    :param counts: If provided, `array` contains distinct values and this is
+        the number of times each of them appears.
     """
-    total = 0
-    count = 0
-    for elem in array:
-        if elem is not None:
-            total += elem
-            count += 1
-    mean = total / count if count > 0 else 0
-
-    total = 0
-    for elem in array:
-        if elem is not None:
-            elem = elem - mean
-            total += elem * elem
-    stddev = math.sqrt(total / count) if count > 0 else 0
+    # None becomes NaN
+    array = numpy.asarray(array, dtype=numpy.float64)
+    if counts is None:
+        counts = numpy.ones(len(array))
+    else:
+        counts = numpy.asarray(counts, dtype=numpy.float64)
+    valid = ~numpy.isnan(array)
+    array = array[valid]
+    counts = counts[valid]
+
+    count = counts.sum()
+    if count == 0:
+        return 0, 0
+    mean = float(numpy.dot(array, counts) / count)
+    deviations = array - mean
+    stddev = math.sqrt(
+        float(numpy.dot(deviations * deviations, counts) / count)
+    )
 
     return mean, stddev
 
 
-def get_numerical_ranges(values):
+def _segment_costs(cum_w, cum_x, cum_xx, start, end):
+    """Sum of squared distances to the mean, for values in ``[start, end)``.
+
+    The inputs are cumulative sums over the sorted distinct values, of their
+    weights, weighted values, and weighted squared values.
+    """
+    weight = cum_w[end] - cum_w[start]
+    total = cum_x[end] - cum_x[start]
+    cost = cum_xx[end] - cum_xx[start] - total * total / weight
+    return numpy.maximum(cost, 0.0)
+
+
+def _optimal_level(prev_cost, level, cum_w, cum_x, cum_xx):
+    """Compute the best clustering of each prefix with one more cluster.
+
+    ``prev_cost[m]`` is the cost of splitting the first `m` distinct values
+    into ``level - 1`` clusters. This computes the cost with `level` clusters
+    and where the last one starts, for every prefix, using the fact that the
+    best start never decreases when the prefix grows. That "divide and
+    conquer" recursion is run breadth-first, so every depth is one batch of
+    array operations.
+    """
+    n = len(cum_w) - 1
+    cost = numpy.full(n + 1, numpy.inf)
+    split = numpy.zeros(n + 1, dtype=numpy.intp)
+    # Segments of prefix lengths to solve, and the range where their last
+    # cluster may start
+    lo = numpy.array([level])
+    hi = numpy.array([n])
+    opt_lo = numpy.array([level - 1])
+    opt_hi = numpy.array([n - 1])
+    while len(lo):
+        mid = (lo + hi) // 2
+        cand_hi = numpy.minimum(mid - 1, opt_hi)
+        lengths = cand_hi - opt_lo + 1
+        starts = numpy.concatenate([[0], numpy.cumsum(lengths)[:-1]])
+        candidates = (
+            numpy.arange(lengths.sum())
+            + numpy.repeat(opt_lo - starts, lengths)
+        )
+        ends = numpy.repeat(mid, lengths)
+        values = prev_cost[candidates] + _segment_costs(
+            cum_w, cum_x, cum_xx, candidates, ends,
+        )
+        best_cost = numpy.minimum.reduceat(values, starts)
+        is_best = numpy.flatnonzero(values == numpy.repeat(best_cost, lengths))
+        best = candidates[is_best[numpy.searchsorted(is_best, starts)]]
+        cost[mid] = best_cost
+        split[mid] = best
+
+        left = lo <= mid - 1
+        right = mid + 1 <= hi
+        lo, hi, opt_lo, opt_hi = (
+            numpy.concatenate([lo[left], mid[right] + 1]),
+            numpy.concatenate([mid[left] - 1, hi[right]]),
+            numpy.concatenate([opt_lo[left], best[right]]),
+            numpy.concatenate([best[left], opt_hi[right]]),
+        )
+    return cost, split
+
+
+def _cluster_sorted(values, counts, n_clusters):
+    """Optimally split sorted 1-dimensional data into contiguous clusters.
+
+    This finds the clustering with the lowest sum of squared distances to the
+    means, which is what K-Means looks for, using dynamic programming.
+
+    :param values: Sorted distinct values
+    :param counts: How many times each value appears
+    :return: The boundaries, indexes in `values`, ``n_clusters + 1`` of them
+    """
+    n = len(values)
+    n_clusters = min(n_clusters, n)
+    # Center the values for precision of the cumulative sums
+    centered = values - numpy.average(values, weights=counts)
+    cum_w = numpy.concatenate([[0], numpy.cumsum(counts)]).astype(
+        numpy.float64,
+    )
+    cum_x = numpy.concatenate([[0.0], numpy.cumsum(counts * centered)])
+    cum_xx = numpy.concatenate([
+        [0.0],
+        numpy.cumsum(counts * centered * centered),
+    ])
+
+    # One cluster
+    costs = numpy.full(n + 1, numpy.inf)
+    costs[1:] = _segment_costs(
+        cum_w, cum_x, cum_xx,
+        numpy.zeros(n, dtype=numpy.intp), numpy.arange(1, n + 1),
+    )
+    splits = []
+    for level in range(2, n_clusters):
+        costs, split = _optimal_level(costs, level, cum_w, cum_x, cum_xx)
+        splits.append(split)
+
+    # Walk back from the whole data
+    bounds = [n]
+    if n_clusters > 1:
+        # The last level is only needed for the whole data
+        candidates = numpy.arange(n_clusters - 1, n)
+        bounds.append(candidates[numpy.argmin(
+            costs[candidates] + _segment_costs(
+                cum_w, cum_x, cum_xx, candidates, n,
+            )
+        )])
+    for split in reversed(splits):
+        bounds.append(split[bounds[-1]])
+    bounds.append(0)
+    return numpy.array(bounds[::-1])
+
+
+def get_numerical_ranges(values, counts=None):
     """
     Retrieve the numeral ranges given the input (timestamp, integer, or float).
 
-    This performs K-Means clustering, returning a maximum of 3 ranges.
+    This performs 1-dimensional K-Means clustering, returning a maximum of 3
+    ranges.
+
+    :param counts: If provided, `values` contains distinct values and this is
+        the number of times each of them appears.
     """
 
     if not len(values):
         return []
 
-    logger.info("Computing numerical ranges, %d values", len(values))
+    values = numpy.asarray(values, dtype=numpy.float64)
+    if counts is None:
+        distinct, counts = numpy.unique(values, return_counts=True)
+    else:
+        distinct, inverse = numpy.unique(values, return_inverse=True)
+        counts = numpy.bincount(
+            inverse,
+            weights=counts,
+            minlength=len(distinct),
+        ).astype(numpy.int64)
+        distinct = distinct[counts > 0]
+        counts = counts[counts > 0]
+    total = int(counts.sum())
+    if not total:
+        return []
+
+    logger.info("Computing numerical ranges, %d values", total)
 
-    clustering = KMeans(n_clusters=min(N_RANGES, len(values)),
-                        random_state=0)
-    values_array = numpy.array(values).reshape(-1, 1)
-    with ignore_warnings(ConvergenceWarning):
-        clustering.fit(values_array)
-    logger.info("K-Means clusters: %r", list(clustering.cluster_centers_))
+    bounds = _cluster_sorted(distinct, counts, N_RANGES)
+    logger.info("Clusters start at: %r", list(distinct[bounds[:-1]]))
+    # Positions in the sorted values
+    cum_counts = numpy.cumsum(counts)
+    bounds = numpy.concatenate([[0], cum_counts])[bounds]
 
     # Compute confidence intervals for each range
     ranges = []
     sizes = []
-    for rg in range(N_RANGES):
-        cluster = [values[i]
-                   for i in range(len(values))
-                   if clustering.labels_[i] == rg]
-        if not cluster:
-            continue
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        size = end - start
 
         # Eliminate clusters of outliers
-        if len(cluster) < MIN_RANGE_SIZE * len(values):
+        if size < MIN_RANGE_SIZE * total:
             continue
 
-        cluster.sort()
-        min_idx = int(0.05 * len(cluster))
-        max_idx = int(0.95 * len(cluster))
-        ranges.append([
-            cluster[min_idx],
-            cluster[max_idx],
-        ])
-        sizes.append(len(cluster))
-    ranges.sort()
+        positions = [start + int(0.05 * size), start + int(0.95 * size)]
+        ranges.append(list(
+            distinct[numpy.searchsorted(cum_counts, positions, side='right')]
+        ))
+        sizes.append(int(size))
     logger.info("Ranges: %r", ranges)
     logger.info("Sizes: %r", sizes)
 
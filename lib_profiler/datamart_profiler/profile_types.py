@@ -1,13 +1,16 @@
 import collections
 from datetime import datetime
 import dateutil.tz
+import math
+import numpy
 import opentelemetry.trace
+import pandas
 import re
 import regex
 
 from . import types
 from .spatial import LATITUDE, LONGITUDE, disambiguate_admin_areas
-from .temporal import parse_date
+from .temporal import infer_date_format, parse_dates_all
 
 
 tracer = opentelemetry.trace.get_tracer(__name__)
@@ -48,7 +51,7 @@ _re_wkt_point = re.compile(
 _re_wkt_polygon = re.compile(
     r'^POLYGON ?\('
     r'\([0-9 .]+\)'
-    r'('
+    r'(?:'
     r', ?'
     r'\([0-9 .]+\)'
     r')*'
@@ -76,6 +79,28 @@ _re_latlong_point = re.compile(
     r'\)$'
 )
 _re_whitespace = re.compile(r'\s+')
+_re_letter = re.compile(r'[^\W\d_]')
+
+
+# Structures recognized by regular_exp_count(), in order of precedence
+_structures = [
+    ('int', _re_int),
+    ('float', _re_float),
+    ('url', _re_url),
+    ('file', _re_file),
+    ('point', _re_wkt_point),
+    ('geo_combined', _re_geo_combined),
+    ('other_point', _re_other_point),
+    ('latlong_point', _re_latlong_point),
+    ('polygon', _re_wkt_polygon),
+]
+# All the structures as a single pattern, the first alternative to match wins
+_re_structure = regex.compile('|'.join(
+    '(?P<%s>%s)' % (name, pattern.pattern)
+    for name, pattern in _structures
+))
+
+_boolean_values = ['0', '1', 'true', 'false', 'y', 'n', 'yes', 'no']
 
 
 # Tolerable ratio of unclean data
@@ -92,40 +117,293 @@ TEXT_WORDS_THRESHOLD = 0.5  # 50%
 MAX_CATEGORICAL_RATIO = 0.10  # 10%
 
 
-def regular_exp_count(array):
-    """Count instances matching the structure of each data type, using regexes.
+# Number of distinct values parsed at a time when looking for dates
+DATE_BATCH_SIZE = 1000
+
+
+# Values longer than this are not looked up as administrative areas
+MAX_ADMIN_NAME_LENGTH = 100
+
+
+# With type sampling, structures are first counted on a random sample of the
+# values, of this ratio of the column but at least that many values
+TYPE_SAMPLE_RATIO = 0.01  # 1%
+TYPE_SAMPLE_MIN = 1000
+
+# Number of standard deviations of the confidence bounds on the ratios
+# estimated from the sample (3 is 99.7%)
+TYPE_SAMPLE_Z = 3.0
+
+# The ratios of non-empty values compared to a threshold by identify_types()
+_sample_thresholds = [
+    (('int',), 1.0 - MAX_UNCLEAN),
+    (('int', 'float'), 1.0 - MAX_UNCLEAN),
+    (('point',), 1.0 - MAX_UNCLEAN),
+    (('other_point',), 1.0 - MAX_UNCLEAN),
+    (('latlong_point',), 1.0 - MAX_UNCLEAN),
+    (('geo_combined',), 1.0 - MAX_UNCLEAN),
+    (('polygon',), 1.0 - MAX_UNCLEAN),
+    (('bool',), 1.0 - MAX_UNCLEAN),
+    (('url',), 1.0 - MAX_UNCLEAN),
+    (('file',), 1.0 - MAX_UNCLEAN),
+    (('text',), 1.0 - TEXT_WORDS_THRESHOLD),
+]
+
+# Number of distinct values resolved at a time when looking for admin areas
+ADMIN_BATCH_SIZE = 100
+
+
+def distinct_values_counts(array, return_codes=False):
+    """Find the distinct values of an array and how often each one appears.
+
+    :param return_codes: Also return the index of each element of `array` in
+        the distinct values.
+    :return: A tuple ``(values, counts)`` of NumPy arrays, with the distinct
+        values in order of first appearance, or ``(values, counts, codes)``.
     """
+    if isinstance(getattr(array, 'dtype', None), pandas.StringDtype):
+        # Factorize Arrow-backed strings directly, without making Python
+        # objects for every value
+        codes, values = pandas.factorize(array)
+    else:
+        codes, values = pandas.factorize(numpy.asarray(array, dtype=object))
+    counts = numpy.bincount(codes[codes >= 0], minlength=len(values))
+    if return_codes:
+        return numpy.asarray(values, dtype=object), counts, codes
+    return numpy.asarray(values, dtype=object), counts
+
+
+def native_kind(array):
+    """Find whether an array has a dtype that can be profiled natively.
+
+    Columns of numbers, booleans, and datetimes don't need to be turned into
+    strings and parsed again.
+
+    :return: ``'b'`` for booleans, ``'i'`` for integers, ``'f'`` for floats,
+        ``'M'`` for datetimes, or None for other arrays (e.g. strings)
+    """
+    dtype = getattr(array, 'dtype', None)
+    if isinstance(dtype, pandas.DatetimeTZDtype):
+        return 'M'
+    elif isinstance(dtype, numpy.dtype) and dtype.kind in 'biufM':
+        return 'i' if dtype.kind == 'u' else dtype.kind
+    return None
+
+
+def format_values(array):
+    """Turn an array into strings, like typed columns are when loading data.
+
+    Missing values become empty strings.
+    """
+    # Change to object dtype first and do fillna() to work around bug
+    # https://github.com/pandas-dev/pandas/issues/25353 (nan as str 'nan')
+    return pandas.Series(array).astype(object).fillna('').astype(str)
+
+
+def native_values_counts(array):
+    """Find the distinct values of a typed array and how often each appears.
+
+    This is the same as ``distinct_values_counts(return_codes=True)``, but
+    keeps the dtype. Missing values (NaN or NaT) count as one distinct value.
+
+    :return: A tuple ``(values, counts, codes)`` where `values` is a
+        `pandas.Index`
+    """
+    array = pandas.Series(array)
+    codes, values = pandas.factorize(array)
+    if values.dtype.kind == 'f':
+        # factorize() merges -0.0 into 0.0, but they are different strings
+        floats = array.to_numpy()
+        negative_zero = (floats == 0) & numpy.signbit(floats)
+        if negative_zero.any():
+            present = codes >= 0
+            new_codes, _ = pandas.factorize(
+                codes[present] * 2 + negative_zero[present],
+            )
+            codes[present] = new_codes
+            _, first = numpy.unique(new_codes, return_index=True)
+            values = pandas.Index(floats[present][first])
+    missing = codes < 0
+    if missing.any():
+        # Put the missing value where it first appears, like other values
+        first = int(numpy.argmax(missing))
+        position = int(codes[:first].max()) + 1 if first else 0
+        codes[codes >= position] += 1
+        codes[missing] = position
+        values = values.insert(position, None)
+    counts = numpy.bincount(codes, minlength=len(values))
+    return values, counts, codes
+
+
+def native_exp_count(kind, values, counts):
+    """Count what `regular_exp_count()` would on typed values as strings.
+
+    The count is derived from the values directly, only the floats that are
+    not formatted as plain decimals are turned into strings and matched.
+
+    :param kind: The kind of array, as returned by `native_kind()`
+    :param values: The distinct values
+    :param counts: The number of times each of them appears
+    """
+    counts = numpy.asarray(counts)
     re_count = collections.Counter()
+    if kind == 'b':
+        re_count['bool'] = int(counts.sum())
+    elif kind == 'i':
+        values = numpy.asarray(values)
+        re_count['int'] = int(counts.sum())
+        re_count['bool'] = int(counts[(values == 0) | (values == 1)].sum())
+    elif kind == 'f':
+        values = numpy.asarray(values, dtype=numpy.float64)
+        empty = numpy.isnan(values)
+        # Python only uses decimal notation for those
+        with numpy.errstate(invalid='ignore'):
+            plain = (values == 0) | (
+                (1e-4 <= numpy.abs(values)) & (numpy.abs(values) < 1e16)
+            )
+            integral = plain & (values == numpy.floor(values))
+        re_count['empty'] = int(counts[empty].sum())
+        re_count['int'] = int(counts[integral].sum())
+        re_count['float'] = int(counts[plain & ~integral].sum())
+        other = ~(empty | plain)
+        if other.any():
+            re_count.update(regular_exp_count(
+                format_values(values[other]).to_numpy(dtype=object),
+                counts[other],
+            ))
+    elif kind == 'M':
+        re_count['empty'] = int(counts[pandas.isna(values)].sum())
+    else:
+        raise ValueError("Not a typed array")
+    return +re_count
+
+
+def native_dates(values, counts):
+    """Get the dates from a datetime array, like `parse_dates()` would.
 
-    for elem in array:
-        if not elem:
-            re_count['empty'] += 1
-        elif _re_int.match(elem):
-            re_count['int'] += 1
-        elif _re_float.match(elem):
-            re_count['float'] += 1
-        elif _re_url.match(elem):
-            re_count['url'] += 1
-        elif _re_file.match(elem):
-            re_count['file'] += 1
-        elif _re_wkt_point.match(elem):
-            re_count['point'] += 1
-        elif _re_geo_combined.match(elem):
-            re_count['geo_combined'] += 1
-        elif _re_other_point.match(elem):
-            re_count['other_point'] += 1
-        elif _re_latlong_point.match(elem):
-            re_count['latlong_point'] += 1
-        elif _re_wkt_polygon.match(elem):
-            re_count['polygon'] += 1
-        elif len(_re_whitespace.findall(elem)) >= TEXT_WORDS - 1:
-            re_count['text'] += 1
-        if elem.lower() in ('0', '1', 'true', 'false', 'y', 'n', 'yes', 'no'):
-            re_count['bool'] += 1
+    :param values: The distinct values, with a datetime dtype
+    :param counts: The number of times each of them appears
+    :return: A `pandas.DatetimeIndex`, which has a timezone
+    """
+    values = pandas.DatetimeIndex(values)
+    valid = ~values.isna()
+    values = values[valid].repeat(numpy.asarray(counts)[valid])
+    if values.tz is None:
+        # Like strings with no timezone, assume UTC
+        values = values.tz_localize('UTC')
+    return values
+
+
+def parse_numbers(array):
+    """Parse an array of strings as numbers.
+
+    :return: A float64 NumPy array, with NaN where the value is not a number.
+    """
+    numbers = pandas.to_numeric(
+        numpy.asarray(array, dtype=object),
+        errors='coerce',
+    )
+    return numpy.asarray(numbers, dtype=numpy.float64)
+
+
+def regular_exp_count(array, counts=None):
+    """Count instances matching the structure of each data type, using regexes.
+
+    :param array: The list, series, or array to inspect
+    :param counts: If provided, `array` contains distinct values and this is
+        the number of times each of them appears.
+    """
+    if counts is None:
+        array, counts = distinct_values_counts(array)
+    values = pandas.Series(array, dtype=object)
+    counts = numpy.asarray(counts)
+
+    # Classify each distinct value using the combined pattern
+    structures = values.map(
+        lambda elem: getattr(_re_structure.match(elem), 'lastgroup', None)
+    )
+    structures[values == ''] = 'empty'
+
+    # Values with no structure might be text, if they have enough words
+    unmatched = structures.isna()
+    if unmatched.any():
+        words = values[unmatched].str.count(_re_whitespace.pattern)
+        structures[unmatched] = numpy.where(
+            words >= TEXT_WORDS - 1,
+            'text',
+            None,
+        )
+
+    re_count = collections.Counter({
+        structure: int(count)
+        for structure, count in pandas.Series(counts).groupby(
+            structures.to_numpy(),
+        ).sum().items()
+    })
+
+    # Booleans are counted separately, they can also be int
+    is_bool = values.str.lower().isin(_boolean_values).to_numpy()
+    if is_bool.any():
+        re_count['bool'] = int(counts[is_bool].sum())
 
     return re_count
 
 
+def _ratio_bounds(successes, total, z=TYPE_SAMPLE_Z):
+    """Get the Wilson score interval of a ratio estimated from a sample.
+    """
+    ratio = successes / total
+    z2 = z * z
+    center = (ratio + z2 / (2 * total)) / (1.0 + z2 / total)
+    margin = z * math.sqrt(
+        ratio * (1.0 - ratio) / total + z2 / (4 * total * total)
+    ) / (1.0 + z2 / total)
+    return center - margin, center + margin
+
+
+def sample_exp_count(values, counts, sample_size, seed=0):
+    """Estimate `regular_exp_count()` from a random sample of the values.
+
+    The estimate is only returned if every ratio that the type detection
+    compares to a threshold is known to be on one side of it, with
+    confidence. The number of empty values is exact.
+
+    :param values: The distinct values
+    :param counts: The number of times each of them appears
+    :param sample_size: The number of values to draw (with replacement)
+    :return: The estimated counts, or None if the sample is not conclusive
+    """
+    values = numpy.asarray(values, dtype=object)
+    counts = numpy.asarray(counts)
+    empty = values == ''
+    num_empty = int(counts[empty].sum())
+    weights = numpy.where(empty, 0, counts)
+    num_values = int(weights.sum())
+    if num_values == 0:
+        return None
+
+    rand = numpy.random.RandomState(seed)
+    sample_counts = rand.multinomial(sample_size, weights / num_values)
+    picked = numpy.flatnonzero(sample_counts)
+    sample_count = regular_exp_count(values[picked], sample_counts[picked])
+
+    for structures, threshold in _sample_thresholds:
+        low, high = _ratio_bounds(
+            sum(sample_count[s] for s in structures),
+            sample_size,
+        )
+        if low < threshold <= high:
+            return None
+
+    re_count = collections.Counter({
+        structure: int(round(count * num_values / sample_size))
+        for structure, count in sample_count.items()
+    })
+    if num_empty:
+        re_count['empty'] = num_empty
+    return re_count
+
+
 def unclean_values_ratio(c_type, re_count, num_total):
     """Count how many values don't match a given type.
 
@@ -150,18 +428,86 @@ def unclean_values_ratio(c_type, re_count, num_total):
     return ratio
 
 
-def parse_dates(array):
+def parse_dates(array, counts=None, threshold=None):
     """Parse the valid dates in an array of strings.
+
+    :param counts: If provided, `array` contains distinct values and this is
+        the number of times each of them appears. Each value is parsed once,
+        and the result is repeated that many times.
+    :param threshold: If provided, stop and return an empty list as soon as
+        it is certain that fewer than this many values are dates.
     """
+    if counts is None:
+        array, counts = distinct_values_counts(array)
+    array = numpy.asarray(array, dtype=object)
+    counts = numpy.asarray(counts)
+
+    if threshold is None:
+        dates = parse_dates_all(array)
+    else:
+        # Parse the most common values first, in batches, so that columns
+        # which are not dates can be rejected early
+        dates = [None] * len(array)
+        possible = int(counts.sum())
+        order = numpy.argsort(-counts, kind='stable')
+        date_format = infer_date_format(array[order])
+        for start in range(0, len(order), DATE_BATCH_SIZE):
+            batch = order[start:start + DATE_BATCH_SIZE]
+            for idx, dt in zip(
+                batch,
+                parse_dates_all(array[batch], date_format),
+            ):
+                if dt is None:
+                    possible -= counts[idx]
+                else:
+                    dates[idx] = dt
+            if possible < threshold:
+                return []
+
     parsed_dates = []
-    for elem in array:
-        elem = parse_date(elem)
+    for elem, count in zip(dates, counts):
         if elem is not None:
-            parsed_dates.append(elem)
+            parsed_dates.extend([elem] * count)
     return parsed_dates
 
 
-def identify_types(array, name, geo_data, manual=None):
+def resolve_admin_areas(geo_data, names, min_resolved):
+    """Resolve names into administrative areas, if enough of them are.
+
+    Values that can't be names are counted out first, then the names are
+    resolved in batches, giving up as soon as it is certain that no more than
+    `min_resolved` of them will be.
+
+    :return: The list of candidate areas for each name that was resolved, or
+        None if there are not more than `min_resolved` of them.
+    """
+    names = pandas.Series(names, dtype=object)
+    possible = (
+        names.str.contains(_re_letter.pattern)
+        & (names.str.len() <= MAX_ADMIN_NAME_LENGTH)
+    ).to_numpy(dtype=bool)
+    if possible.sum() <= min_resolved:
+        return None
+    names = names[possible].tolist()
+
+    admin_areas = []
+    for start in range(0, len(names), ADMIN_BATCH_SIZE):
+        batch = names[start:start + ADMIN_BATCH_SIZE]
+        admin_areas.extend(r for r in geo_data.resolve_names_all(batch) if r)
+        if len(admin_areas) + len(names) - start - len(batch) <= min_resolved:
+            return None
+    return admin_areas
+
+
+def _non_empty_set(values):
+    distinct_values = set(values)
+    distinct_values.discard('')
+    return distinct_values
+
+
+def identify_types(array, name, geo_data, manual=None, distinct=None,
+                   numbers=None, re_count=None, dates=None,
+                   type_sampling=False):
     """Identify the structural type and semantic types of an array.
 
     :param array: The list, series, or array to inspect
@@ -169,6 +515,18 @@ def identify_types(array, name, geo_data, manual=None):
         heuristics like latitude, longitude, year number.
     :param manual: Manual information provided by the user that will be
         reconciled with the observed data.
+    :param distinct: The distinct values of `array` and their counts, as
+        returned by `distinct_values_counts()`, if they were already computed.
+    :param numbers: The distinct values parsed by `parse_numbers()`, if they
+        were already computed.
+    :param re_count: The structures of the values, as counted by
+        `regular_exp_count()`, if they were already computed.
+    :param dates: The dates found in the array, as returned by
+        `parse_dates()`, if they are already known. This can be an empty list
+        to skip looking for dates.
+    :param type_sampling: Count the structures of a random sample of the
+        values first, using the counts of the whole column only if that is not
+        conclusive. Which one was used is reported as ``type_detection``.
     :return: A tuple ``(structural_type, semantic_types_dict, column_meta)``
         where `structural_type` is the detected structural type (e.g. storage
         format), `semantic_types_dict` is a dict mapping semantic types (e.g.
@@ -178,9 +536,24 @@ def identify_types(array, name, geo_data, manual=None):
     num_total = len(array)
     column_meta = {}
 
+    # Heuristics only need to look at each distinct value once
+    if distinct is None:
+        distinct = distinct_values_counts(array)
+    values, counts = distinct
+
     # This function let you check/count how many instances match a structure of particular data type
-    with tracer.start_as_current_span('profile/regular_exp_count'):
-        re_count = regular_exp_count(array)
+    if type_sampling:
+        column_meta['type_detection'] = 'full'
+    if re_count is None:
+        sample_size = max(TYPE_SAMPLE_MIN, int(TYPE_SAMPLE_RATIO * num_total))
+        if type_sampling and len(values) > sample_size:
+            with tracer.start_as_current_span('profile/sample_exp_count'):
+                re_count = sample_exp_count(values, counts, sample_size)
+            if re_count is not None:
+                column_meta['type_detection'] = 'sample'
+        if re_count is None:
+            with tracer.start_as_current_span('profile/regular_exp_count'):
+                re_count = regular_exp_count(values, counts)
 
     # Identify structural type and compute unclean values ratio
     threshold = max(1, (1.0 - MAX_UNCLEAN) * (num_total - re_count['empty']))
@@ -211,7 +584,11 @@ def identify_types(array, name, geo_data, manual=None):
     if structural_type != types.MISSING_DATA and re_count['empty'] > 0:
         column_meta['missing_values_ratio'] = re_count['empty'] / num_total
 
-    distinct_values = set(e for e in array if e)
+    # The values are already distinct, only the empty string is left out.
+    # The set of values is only built if the column is categorical
+    num_distinct = len(values) - int(numpy.count_nonzero(
+        numpy.asarray(values, dtype=object) == ''
+    ))
 
     semantic_types_dict = {}
     if manual:
@@ -223,21 +600,28 @@ def identify_types(array, name, geo_data, manual=None):
                 column_meta['unclean_values_ratio'] = \
                     unclean_values_ratio(types.BOOLEAN, re_count, num_total)
             if el == types.DATE_TIME:
-                dates = parse_dates(array)
+                if dates is None:
+                    dates = parse_dates(values, counts)
                 semantic_types_dict[types.DATE_TIME] = dates
             if el == types.ADMIN:
-                if geo_data is not None and len(distinct_values) >= 3:
-                    admin_areas = geo_data.resolve_names_all(array)
-                    admin_areas = [r for r in admin_areas if r]
+                if geo_data is not None and num_distinct >= 3:
+                    admin_areas = geo_data.resolve_names_all(values)
+                    admin_areas = [
+                        r
+                        for r, count in zip(admin_areas, counts)
+                        if r
+                        for _ in range(count)
+                    ]
                     if admin_areas:
                         admin_areas = disambiguate_admin_areas(admin_areas)
                         if admin_areas is not None:
                             semantic_types_dict[types.ADMIN] = admin_areas
             if el == types.CATEGORICAL or el == types.INTEGER:
                 # Count distinct values
-                column_meta['num_distinct_values'] = len(distinct_values)
+                column_meta['num_distinct_values'] = num_distinct
                 if el == types.CATEGORICAL:
-                    semantic_types_dict[types.CATEGORICAL] = distinct_values
+                    semantic_types_dict[types.CATEGORICAL] = \
+                        _non_empty_set(values)
     else:
         num_bool = re_count['bool']
         num_text = re_count['text']
@@ -263,11 +647,14 @@ def identify_types(array, name, geo_data, manual=None):
                 semantic_types_dict[types.FILE_PATH] = None
 
             # Administrative areas
-            if geo_data is not None and len(distinct_values) >= 3:
+            if geo_data is not None and num_distinct >= 3:
                 with tracer.start_as_current_span('profile/admin_areas'):
-                    admin_areas = geo_data.resolve_names_all(distinct_values)
-                    admin_areas = [r for r in admin_areas if r]
-                    if len(admin_areas) > 0.7 * len(distinct_values):
+                    admin_areas = resolve_admin_areas(
+                        geo_data,
+                        [e for e in values if e],
+                        0.7 * num_distinct,
+                    )
+                    if admin_areas is not None:
 
                         admin_areas = disambiguate_admin_areas(admin_areas)
                         if admin_areas is not None:
@@ -284,14 +671,15 @@ def identify_types(array, name, geo_data, manual=None):
                 semantic_types_dict[types.TEXT] = None
             else:
                 # Count distinct values
-                column_meta['num_distinct_values'] = len(distinct_values)
+                column_meta['num_distinct_values'] = num_distinct
                 max_categorical = MAX_CATEGORICAL_RATIO * (len(array) - num_empty)
                 if (
                     categorical or
-                    len(distinct_values) <= max_categorical or
+                    num_distinct <= max_categorical or
                     types.BOOLEAN in semantic_types_dict
                 ):
-                    semantic_types_dict[types.CATEGORICAL] = distinct_values
+                    semantic_types_dict[types.CATEGORICAL] = \
+                        _non_empty_set(values)
         elif structural_type == types.INTEGER:
             # Identify ids
             # TODO: is this enough?
@@ -305,38 +693,37 @@ def identify_types(array, name, geo_data, manual=None):
                 semantic_types_dict[types.ID] = None
 
             # Count distinct values
-            column_meta['num_distinct_values'] = len(distinct_values)
+            column_meta['num_distinct_values'] = num_distinct
 
             # Identify years
             if name.strip().lower() == 'year':
                 with tracer.start_as_current_span('profile/parse_years'):
-                    dates = []
-                    for year in array:
+                    years = []
+                    for year, count in zip(values, counts):
                         try:
-                            dates.append(datetime(
+                            date = datetime(
                                 int(year), 1, 1,
                                 tzinfo=dateutil.tz.UTC,
-                            ))
+                            )
                         except ValueError:
                             pass
-                    if len(dates) >= threshold:
+                        else:
+                            years.extend([date] * count)
+                    if len(years) >= threshold:
                         structural_type = types.TEXT
-                        semantic_types_dict[types.DATE_TIME] = dates
+                        semantic_types_dict[types.DATE_TIME] = years
 
         # Identify lat/long
         if structural_type == types.FLOAT:
             with tracer.start_as_current_span('profile/parse_latlong'):
-                num_lat = num_long = 0
-                for elem in array:
-                    try:
-                        elem = float(elem)
-                    except ValueError:
-                        pass
-                    else:
-                        if -180.0 <= float(elem) <= 180.0:
-                            num_long += 1
-                            if -90.0 <= float(elem) <= 90.0:
-                                num_lat += 1
+                if numbers is None:
+                    numbers = parse_numbers(values)
+                num_long = int(counts[
+                    (-180.0 <= numbers) & (numbers <= 180.0)
+                ].sum())
+                num_lat = int(counts[
+                    (-90.0 <= numbers) & (numbers <= 90.0)
+                ].sum())
 
                 if num_lat >= threshold and any(n in name.lower() for n in LATITUDE):
                     semantic_types_dict[types.LATITUDE] = None
@@ -344,8 +731,11 @@ def identify_types(array, name, geo_data, manual=None):
                     semantic_types_dict[types.LONGITUDE] = None
 
         # Identify dates
-        with tracer.start_as_current_span('profile/parse_dates'):
-            parsed_dates = parse_dates(array)
+        if dates is not None:
+            parsed_dates = dates
+        else:
+            with tracer.start_as_current_span('profile/parse_dates'):
+                parsed_dates = parse_dates(values, counts, threshold)
 
         if len(parsed_dates) >= threshold:
             semantic_types_dict[types.DATE_TIME] = parsed_dates
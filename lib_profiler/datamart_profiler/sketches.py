@@ -0,0 +1,329 @@
+"""Mergeable sketches, summarizing a column in bounded memory.
+
+Those are used to profile a whole file chunk by chunk, see
+:mod:`datamart_profiler.streaming`. Every sketch has an ``add()`` method
+taking a whole array of values, and a ``merge()`` method combining it with
+another sketch of the same kind.
+"""
+
+import math
+import numpy
+import pandas
+
+
+class HyperLogLog(object):
+    """Estimate the number of distinct values.
+
+    The relative error is about ``1.04 / sqrt(2 ** precision)``, e.g. 0.8% with
+    the default precision of 14, which uses 16 kB.
+    """
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ValueError("Precision should be between 4 and 18")
+        self.precision = precision
+        self.registers = numpy.zeros(1 << precision, dtype=numpy.uint8)
+
+    def add(self, values):
+        """Add an array of (string) values.
+        """
+        if not len(values):
+            return
+        hashes = pandas.util.hash_array(numpy.asarray(values, dtype=object))
+        p = numpy.uint64(self.precision)
+        index = (hashes >> numpy.uint64(64 - self.precision)).astype(numpy.intp)
+        # Count the leading zeros in the rest of the hash, with a sentinel
+        # bit to bound the result
+        rest = (hashes << p) | (numpy.uint64(1) << (p - numpy.uint64(1)))
+        rank = numpy.ones(len(rest), dtype=numpy.uint8)
+        for shift in (32, 16, 8, 4, 2, 1):
+            zeros = (rest >> numpy.uint64(64 - shift)) == 0
+            rank[zeros] += shift
+            rest[zeros] <<= numpy.uint64(shift)
+        numpy.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Can't merge sketches of different precisions")
+        numpy.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """Get the estimated number of distinct values.
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1.0 + 1.079 / m)
+        estimate = alpha * m * m / numpy.sum(
+            numpy.exp2(-self.registers.astype(numpy.float64)),
+        )
+        zeros = numpy.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros > 0:
+            # Small range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class QuantileSketch(object):
+    """Approximate the distribution of numbers, using a KLL sketch.
+
+    This keeps about ``3 * k`` numbers, and answers rank queries with an error
+    of roughly ``1.7 / k`` of the total count.
+    """
+    def __init__(self, k=256, seed=0):
+        self.k = k
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.compactors = [numpy.empty(0)]
+        self._random = numpy.random.RandomState(seed)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.compactors):
+            items = self.compactors[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(numpy.empty(0))
+                items = numpy.sort(items)
+                # Keep one item here if there is an odd number
+                if len(items) % 2 == 1:
+                    self.compactors[level] = items[-1:]
+                    items = items[:-1]
+                else:
+                    self.compactors[level] = numpy.empty(0)
+                # Promote every other item to the next level, where it counts
+                # twice
+                offset = self._random.randint(2)
+                self.compactors[level + 1] = numpy.concatenate([
+                    self.compactors[level + 1],
+                    items[offset::2],
+                ])
+            level += 1
+
+    def add(self, values):
+        """Add an array of numbers.
+        """
+        values = numpy.asarray(values, dtype=numpy.float64)
+        if not len(values):
+            return
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.compactors[0] = numpy.concatenate([self.compactors[0], values])
+        self._compress()
+
+    def merge(self, other):
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(numpy.empty(0))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = numpy.concatenate([
+                self.compactors[level],
+                items,
+            ])
+        self._compress()
+
+    def _weighted_items(self):
+        items = numpy.concatenate(self.compactors)
+        weights = numpy.concatenate([
+            numpy.full(len(c), 2 ** level, dtype=numpy.int64)
+            for level, c in enumerate(self.compactors)
+        ])
+        order = numpy.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def rank(self, values):
+        """Estimate the number of items strictly smaller than each value.
+        """
+        values = numpy.asarray(values, dtype=numpy.float64)
+        items, weights = self._weighted_items()
+        cumulative = numpy.concatenate([[0], numpy.cumsum(weights)])
+        ranks = cumulative[numpy.searchsorted(items, values, side='left')]
+        # Scale to the exact count, the total weight can be off by one per
+        # compaction
+        if cumulative[-1] > 0:
+            ranks = ranks * (self.count / cumulative[-1])
+        return ranks
+
+    def quantiles(self, fractions):
+        """Estimate the values at the given fractions of the distribution.
+        """
+        fractions = numpy.asarray(fractions, dtype=numpy.float64)
+        if not self.count:
+            return numpy.full(len(fractions), numpy.nan)
+        items, weights = self._weighted_items()
+        cumulative = numpy.cumsum(weights)
+        idx = numpy.searchsorted(
+            cumulative,
+            fractions * cumulative[-1],
+            side='left',
+        )
+        result = items[numpy.minimum(idx, len(items) - 1)]
+        # The extremes are known exactly
+        result[fractions <= 0.0] = self.min
+        result[fractions >= 1.0] = self.max
+        return result
+
+    def sample(self, size=1000):
+        """Get numbers evenly spread over the distribution.
+
+        This can be used in place of the original values to compute ranges or
+        clusters.
+        """
+        size = min(size, self.count)
+        if size <= 1:
+            return self.quantiles(numpy.zeros(size))
+        return self.quantiles(numpy.linspace(0.0, 1.0, size))
+
+    def histogram(self, bins=10):
+        """Estimate a histogram like ``numpy.histogram(values, bins)``.
+        """
+        if self.min == self.max:
+            edges = numpy.linspace(self.min - 0.5, self.max + 0.5, bins + 1)
+        else:
+            edges = numpy.linspace(self.min, self.max, bins + 1)
+        ranks = numpy.concatenate([
+            [0],
+            self.rank(edges[1:-1]),
+            [self.count],
+        ])
+        counts = numpy.diff(numpy.round(ranks)).astype(numpy.int64)
+        return counts, edges
+
+
+class Moments(object):
+    """Compute the mean and standard deviation of a stream of numbers.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        if total == 0:
+            return
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def add(self, values):
+        """Add an array of numbers.
+        """
+        values = numpy.asarray(values, dtype=numpy.float64)
+        if not len(values):
+            return
+        mean = float(values.mean())
+        m2 = float(numpy.sum((values - mean) ** 2))
+        self._combine(len(values), mean, m2)
+
+    def merge(self, other):
+        self._combine(other.count, other.mean, other._m2)
+
+    @property
+    def stddev(self):
+        if self.count == 0:
+            return 0.0
+        return math.sqrt(self._m2 / self.count)
+
+
+class TopK(object):
+    """Find the most frequent values, using the Space-Saving algorithm.
+
+    At most `capacity` values are tracked. Their counts are over-estimated by
+    at most `error`, the largest count that was discarded.
+    """
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = pandas.Series([], dtype=numpy.int64)
+        self.error = 0
+
+    def _combine(self, counts, error):
+        index = self.counts.index.append(
+            counts.index[~counts.index.isin(self.counts.index)]
+        )
+        combined = (
+            self.counts.reindex(index, fill_value=self.error)
+            + counts.reindex(index, fill_value=error)
+        )
+        self.error += error
+        if len(combined) > self.capacity:
+            order = numpy.argsort(-combined.values, kind='stable')
+            self.error = max(
+                self.error,
+                int(combined.values[order[self.capacity]]),
+            )
+            combined = combined.iloc[numpy.sort(order[:self.capacity])]
+        self.counts = combined
+
+    def add(self, values, counts=None):
+        """Add an array of values, or distinct values and how often they occur.
+        """
+        if counts is None:
+            counts = pandas.Series(values).value_counts(sort=False)
+        else:
+            counts = pandas.Series(
+                numpy.asarray(counts, dtype=numpy.int64),
+                index=pandas.Index(values, dtype=object),
+            )
+        if not counts.index.is_unique:
+            counts = counts.groupby(level=0, sort=False).sum()
+        self._combine(counts.astype(numpy.int64), 0)
+
+    def merge(self, other):
+        self._combine(other.counts, other.error)
+
+    def most_common(self, n):
+        """List the `n` most common values and their counts.
+
+        Like ``collections.Counter.most_common()``, ties are listed in the
+        order they were first seen.
+        """
+        order = numpy.argsort(-self.counts.values, kind='stable')[:n]
+        return [
+            (self.counts.index[i], int(self.counts.values[i]))
+            for i in order
+        ]
+
+
+class Reservoir(object):
+    """Keep a uniform random sample of bounded size from a stream of rows.
+
+    Each row gets a random priority and the rows with the lowest priorities are
+    kept (bottom-k sampling), so samples can be merged.
+    """
+    def __init__(self, size=10000, seed=0):
+        self.size = size
+        self.rows = None
+        self._priorities = numpy.empty(0)
+        self._random = numpy.random.RandomState(seed)
+
+    def _combine(self, rows, priorities):
+        if self.rows is not None:
+            rows = numpy.concatenate([self.rows, rows])
+            priorities = numpy.concatenate([self._priorities, priorities])
+        if len(rows) > self.size:
+            keep = numpy.sort(
+                numpy.argpartition(priorities, self.size - 1)[:self.size]
+            )
+            rows = rows[keep]
+            priorities = priorities[keep]
+        self.rows = rows
+        self._priorities = priorities
+
+    def add(self, rows):
+        """Add an array of rows.
+        """
+        rows = numpy.asarray(rows)
+        if not len(rows):
+            return
+        self._combine(rows, self._random.random_sample(len(rows)))
+
+    def merge(self, other):
+        if other.rows is not None:
+            self._combine(other.rows, other._priorities)
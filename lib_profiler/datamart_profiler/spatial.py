@@ -1,16 +1,22 @@
 import collections
+import concurrent.futures
 from dataclasses import dataclass
+import itertools
 import json
 import logging
 import math
 import numpy
 import numpy.random
+import os
+import pandas
 import prometheus_client
 import re
 import requests
 from sklearn.cluster import KMeans
 from sklearn.exceptions import ConvergenceWarning
 from sklearn.neighbors._kd_tree import KDTree
+import sqlite3
+import threading
 import time
 import typing
 from urllib.parse import urlencode
@@ -18,11 +24,19 @@ from urllib.parse import urlencode
 from .warning_tools import ignore_warnings
 
 
+try:
+    import pyarrow
+    import pyarrow.compute
+except ImportError:
+    pyarrow = None
+
+
 logger = logging.getLogger(__name__)
 
 
 N_RANGES = 3
 MIN_RANGE_SIZE = 0.10  # 10%
+MAX_CLUSTERING_POINTS = 100000
 
 SPATIAL_RANGE_DELTA_LONG = 0.0001
 SPATIAL_RANGE_DELTA_LAT = 0.0001
@@ -31,12 +45,17 @@ MAX_ADDRESS_LENGTH = 90  # 90 characters
 MAX_NOMINATIM_REQUESTS = 200
 NOMINATIM_BATCH_SIZE = 20
 NOMINATIM_MIN_SPLIT_BATCH_SIZE = 2  # Batches >=this are divided on failure
+NOMINATIM_CONCURRENCY = 4  # Batches sent at the same time
+NOMINATIM_RATE = 20.0  # Requests per second
+NOMINATIM_CACHE_TTL = 30 * 24 * 3600  # 30 days
 
 LATITUDE = ('latitude', 'lat', 'ycoord', 'y_coord')
 LONGITUDE = ('longitude', 'long', 'lon', 'lng', 'xcoord', 'x_coord')
 
 MAX_WRONG_LEVEL_ADMIN = 0.10  # 10%
 
+ADMIN_CACHE_SIZE = 100000  # Names kept in memory by CachedGeoData
+
 
 PROM_NOMINATIM_REQS = prometheus_client.Counter(
     'profile_nominatim_reqs', "Queries to Nominatim",
@@ -46,41 +65,55 @@ PROM_NOMINATIM_REQ_TIME = prometheus_client.Histogram(
 )
 
 
-def get_spatial_ranges(values):
+def get_spatial_ranges(values, max_points=MAX_CLUSTERING_POINTS):
     """Build a small number (3) of bounding boxes from lat/long points.
 
     This performs K-Means clustering, returning a maximum of 3 clusters as
     bounding boxes.
+
+    :param values: The points, as an array of (latitude, longitude)
+    :param max_points: If there are more points than this, the clusters are
+        computed on a random sample of that size (with a fixed seed), and all
+        the points are then assigned to their closest cluster
     """
+    values = numpy.asarray(values, dtype=numpy.float64).reshape(-1, 2)
 
     clustering = KMeans(n_clusters=min(N_RANGES, len(values)),
                         random_state=0)
     with ignore_warnings(ConvergenceWarning):
-        clustering.fit(values)
+        if len(values) > max_points:
+            logger.info(
+                "Clustering a sample of %d points out of %d",
+                max_points, len(values),
+            )
+            sample = numpy.random.RandomState(0).choice(
+                len(values), max_points, replace=False,
+            )
+            clustering.fit(values[sample])
+            labels = clustering.predict(values)
+        else:
+            clustering.fit(values)
+            labels = clustering.labels_
     logger.info("K-Means clusters: %r", list(clustering.cluster_centers_))
 
     # Compute confidence intervals for each range
     ranges = []
     sizes = []
     for rg in range(N_RANGES):
-        cluster = [values[i]
-                   for i in range(len(values))
-                   if clustering.labels_[i] == rg]
-        if not cluster:
+        cluster = values[labels == rg]
+        if not len(cluster):
             continue
 
         # Eliminate clusters of outliers
         if len(cluster) < MIN_RANGE_SIZE * len(values):
             continue
 
-        cluster.sort(key=lambda p: p[0])
+        # Sort latitudes and longitudes independently
+        cluster = numpy.sort(cluster, axis=0)
         min_idx = int(0.05 * len(cluster))
         max_idx = int(0.95 * len(cluster))
-        min_lat = cluster[min_idx][0]
-        max_lat = cluster[max_idx][0]
-        cluster.sort(key=lambda p: p[1])
-        min_long = cluster[min_idx][1]
-        max_long = cluster[max_idx][1]
+        min_lat, min_long = cluster[min_idx].tolist()
+        max_lat, max_long = cluster[max_idx].tolist()
         ranges.append([
             [min_long, max_lat],
             [max_long, min_lat],
@@ -172,25 +205,47 @@ def pair_latlong_columns(columns_lat, columns_long):
 
 _re_loc = re.compile(
     r'\('
-    r'(-?[0-9]{1,3}\.[0-9]{1,15})'
+    r'(?P<x>-?[0-9]{1,3}\.[0-9]{1,15})'
     r'(?:,| |(?:, ))'
-    r'(-?[0-9]{1,3}\.[0-9]{1,15})'
+    r'(?P<y>-?[0-9]{1,3}\.[0-9]{1,15})'
     r'\)$'
 )
 
+# The same pattern for Arrow (RE2), where '$' only matches at the very end,
+# while Python's '$' also matches before a final newline
+_re2_loc = _re_loc.pattern[:-1] + r'\n?$'
 
-def _parse_point(value, latlong):
-    m = _re_loc.search(value)
-    if m is not None:
+
+def _extract_coordinates(values):
+    if pyarrow is not None:
         try:
-            x = float(m.group(1))
-            y = float(m.group(2))
-        except ValueError:
-            return None
-        if latlong:
-            x, y = y, x
-        if -180.0 < x < 180.0 and -90.0 < y < 90.0:
-            return y, x
+            array = pyarrow.array(values, type=pyarrow.string(),
+                                  from_pandas=True)
+        except (TypeError, ValueError):
+            pass  # Not all strings
+        else:
+            parts = pyarrow.compute.extract_regex(
+                array, pattern=_re2_loc,
+            )
+            # Values that didn't match are null, but their fields are not
+            matched = pyarrow.compute.is_valid(parts)
+            return [
+                pyarrow.compute.cast(
+                    pyarrow.compute.if_else(
+                        matched,
+                        pyarrow.compute.struct_field(parts, [i]),
+                        None,
+                    ),
+                    pyarrow.float64(),
+                ).to_numpy(zero_copy_only=False)
+                for i in range(2)
+            ]
+
+    parts = pandas.Series(values, dtype=object).str.extract(_re_loc)
+    return [
+        parts[name].to_numpy(dtype=numpy.float64, na_value=numpy.nan)
+        for name in ('x', 'y')
+    ]
 
 
 def parse_wkt_column(values, latlong=False):
@@ -198,30 +253,44 @@ def parse_wkt_column(values, latlong=False):
 
     :param latlong: If False (the default), read ``(long, lat)`` format. If
         True, read ``(lat, long)``.
-    :returns: A list of ``(lat, long)`` pairs
+    :returns: A NumPy array of ``(lat, long)`` pairs, of shape ``(n, 2)``
     """
     # Parse points
-    values = values.apply(_parse_point, latlong=latlong)
-    # Drop NaN values
-    values = values.dropna(axis=0)
+    x, y = _extract_coordinates(values)
+    if latlong:
+        x, y = y, x
+    # Drop values that didn't parse or are out of range (NaN compares false)
+    mask = (-180.0 < x) & (x < 180.0) & (-90.0 < y) & (y < 90.0)
 
-    return list(values)
+    return numpy.stack([y[mask], x[mask]], axis=1)
 
 
 _nominatim_session = requests.Session()
 
 
-def nominatim_query(url, *, q):
+def nominatim_query(url, *, q, session=None, bucket=None):
+    """Query a Nominatim server, retrying if it is unavailable.
+
+    :param url: URL of the Nominatim server
+    :param q: An address, or a list of addresses to send as a batch
+    :param session: The `requests.Session` to use, defaults to a global one
+    :param bucket: A `TokenBucket` to acquire before each HTTP request,
+        including retries
+    """
+    if session is None:
+        session = _nominatim_session
     url = url.rstrip('/')
     res = start = end = None  # Avoids warnings
     for i in range(5):
         if i > 0:
             time.sleep(1)
+        if bucket is not None:
+            bucket.acquire()
         PROM_NOMINATIM_REQS.inc()  # Count all requests
         start = time.perf_counter()
         if isinstance(q, (tuple, list)):
             # Batch query
-            res = _nominatim_session.get(
+            res = session.get(
                 url +
                 '/search?' +
                 urlencode({
@@ -231,7 +300,7 @@ def nominatim_query(url, *, q):
             )
         else:
             # Normal query
-            res = _nominatim_session.get(
+            res = session.get(
                 url +
                 '/search?' +
                 urlencode({'q': q, 'format': 'jsonv2'}),
@@ -253,48 +322,260 @@ def nominatim_query(url, *, q):
         return res.json()
 
 
-def _nominatim_batch(url, batch, locations, cache):
-    try:
-        locs = nominatim_query(url, q=list(batch.keys()))
-    except requests.HTTPError as e:
-        if (
-            e.response.status_code in (500, 414)
-            and len(batch) >= max(2, NOMINATIM_MIN_SPLIT_BATCH_SIZE)
-        ):
-            # Try smaller batch size
-            batch_list = list(batch.items())
-            mid = len(batch) // 2
-            return (
-                _nominatim_batch(url, dict(batch_list[:mid]), locations, cache)
-                +
-                _nominatim_batch(url, dict(batch_list[mid:]), locations, cache)
+class TokenBucket(object):
+    """Limit the rate of some operation, allowing short bursts.
+
+    This is thread-safe.
+
+    :param rate: Number of operations per second
+    :param burst: Number of operations that can happen at once
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until the operation is allowed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst,
+                self._tokens + (now - self._last) * self.rate,
             )
-        raise e from None
+            self._last = now
+            # Reserve a token, which might only be available in the future
+            self._tokens -= 1
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
 
-    not_found = 0
-    for location, (value, count) in zip(locs, batch.items()):
-        if location:
-            loc = (
-                float(location[0]['lat']),
-                float(location[0]['lon']),
+
+class NominatimClient(object):
+    """Resolve addresses using a Nominatim server.
+
+    Batches of addresses are sent from multiple threads, limiting the rate of
+    requests. Results can be kept in a SQLite file, which can be shared by
+    multiple processes and kept between runs.
+
+    `nominatim_resolve_all()` also accepts a URL, but a client should be
+    created once and shared so the rate limit and cache apply across columns.
+
+    :param url: URL of the Nominatim server
+    :param cache_path: Path to a SQLite file to keep the results in
+    :param ttl: Seconds after which cached results are looked up again
+    :param concurrency: Number of batches sent at the same time
+    :param rate: Maximum number of requests per second
+    """
+    def __init__(self, url, cache_path=None, *, ttl=NOMINATIM_CACHE_TTL,
+                 concurrency=NOMINATIM_CONCURRENCY, rate=NOMINATIM_RATE):
+        self.url = url
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.rate = rate
+        self._bucket = TokenBucket(rate, burst=concurrency)
+        self._thread_local = threading.local()
+        if cache_path is not None:
+            self._setup_database()
+
+    def __getstate__(self):
+        # Send the settings to worker processes, not the connections
+        return dict(
+            url=self.url, cache_path=self.cache_path,
+            ttl=self.ttl, concurrency=self.concurrency, rate=self.rate,
+        )
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def _database(self):
+        # SQLite3 connections can't be shared between threads
+        try:
+            return self._thread_local.database
+        except AttributeError:
+            database = sqlite3.connect(self.cache_path, timeout=60)
+            self._thread_local.database = database
+            return database
+
+    @property
+    def _session(self):
+        # Sessions are not guaranteed to be thread-safe either
+        try:
+            return self._thread_local.session
+        except AttributeError:
+            session = requests.Session()
+            self._thread_local.session = session
+            return session
+
+    def _setup_database(self):
+        with self._database as database:
+            database.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS addresses(
+                    url TEXT NOT NULL,
+                    address TEXT NOT NULL,
+                    latitude REAL,
+                    longitude REAL,
+                    time REAL NOT NULL,
+                    PRIMARY KEY(url, address)
+                );
+                '''
             )
-            cache[value] = loc
-            locations.extend([loc] * count)
+            database.execute(
+                'DELETE FROM addresses WHERE time < ?;',
+                (time.time() - self.ttl,),
+            )
+
+    def _load(self, values):
+        """Get results from the SQLite file.
+        """
+        found = {}
+        values = list(values)
+        min_time = time.time() - self.ttl
+        for start in range(0, len(values), 500):
+            batch = values[start:start + 500]
+            cur = self._database.execute(
+                '''
+                SELECT address, latitude, longitude FROM addresses
+                WHERE url = ? AND time >= ? AND address IN (%s);
+                ''' % ', '.join('?' for _ in batch),
+                [self.url, min_time] + batch,
+            )
+            for address, latitude, longitude in cur:
+                if latitude is None:
+                    found[address] = None
+                else:
+                    found[address] = latitude, longitude
+        return found
+
+    def _store(self, results):
+        """Add results to the SQLite file.
+        """
+        now = time.time()
+        with self._database as database:
+            database.executemany(
+                '''
+                INSERT OR REPLACE INTO addresses(
+                    url, address, latitude, longitude, time
+                )
+                VALUES(?, ?, ?, ?, ?);
+                ''',
+                [
+                    (self.url, address) + (loc or (None, None)) + (now,)
+                    for address, loc in results.items()
+                ],
+            )
+
+    def _query_batch(self, batch):
+        try:
+            locs = nominatim_query(
+                self.url, q=batch,
+                session=self._session, bucket=self._bucket,
+            )
+        except requests.HTTPError as e:
+            if (
+                e.response.status_code in (500, 414)
+                and len(batch) >= max(2, NOMINATIM_MIN_SPLIT_BATCH_SIZE)
+            ):
+                # Try smaller batch size
+                mid = len(batch) // 2
+                return {
+                    **self._query_batch(batch[:mid]),
+                    **self._query_batch(batch[mid:]),
+                }
+            raise e from None
+
+        results = {}
+        for location, value in zip(locs, batch):
+            if location:
+                results[value] = (
+                    float(location[0]['lat']),
+                    float(location[0]['lon']),
+                )
+            else:
+                results[value] = None
+        return results
+
+    def resolve(self, values):
+        """Resolve distinct addresses.
+
+        :return: A tuple ``(results, queried)`` where `results` is a dict
+            mapping each value to a ``(latitude, longitude)`` tuple or None,
+            and `queried` is the number of values that were not in the cache.
+        """
+        if self.cache_path is not None:
+            results = self._load(values)
         else:
-            cache[value] = None
-            not_found += count
-    batch.clear()
-    return not_found
+            results = {}
+        missing = [value for value in values if value not in results]
 
+        batches = [
+            missing[start:start + NOMINATIM_BATCH_SIZE]
+            for start in range(0, len(missing), NOMINATIM_BATCH_SIZE)
+        ]
+        if len(batches) > 1 and self.concurrency > 1:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(self.concurrency, len(batches)),
+            ) as executor:
+                futures = [
+                    executor.submit(self._query_batch, batch)
+                    for batch in batches
+                ]
+                # Store the batches as they complete, so that a failure
+                # doesn't lose the ones that were resolved
+                error = None
+                for future in concurrent.futures.as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    try:
+                        batch_results = future.result()
+                    except Exception as e:
+                        if error is None:
+                            error = e
+                            # Don't send the batches that haven't started
+                            for other in futures:
+                                other.cancel()
+                        continue
+                    self._add_results(results, batch_results)
+                if error is not None:
+                    raise error
+        else:
+            for batch in batches:
+                self._add_results(results, self._query_batch(batch))
+        return results, len(missing)
+
+    def _add_results(self, results, batch_results):
+        results.update(batch_results)
+        if self.cache_path is not None:
+            self._store(batch_results)
+
+
+def nominatim_resolve_all(nominatim, array,
+                          max_requests=MAX_NOMINATIM_REQUESTS):
+    """Resolve addresses into coordinates.
+
+    :param nominatim: A `NominatimClient`, or the URL of the Nominatim server
+    :param array: The addresses
+    :param max_requests: Stop reading the addresses after this many distinct
+        ones
+    :return: A tuple ``(locations, non_empty)`` where `locations` is the list
+        of coordinates found, once per address resolved, and `non_empty` is
+        the number of non-empty values that were read.
+    """
+    if isinstance(nominatim, str):
+        nominatim = NominatimClient(nominatim)
 
-def nominatim_resolve_all(url, array, max_requests=MAX_NOMINATIM_REQUESTS):
-    cache = {}
-    locations = []
-    not_found = 0  # Unique locations not found
+    # Count the distinct values to look up, in batches. Stop after a full
+    # batch if there are enough
+    values = {}
     non_empty = 0
     start = time.perf_counter()
     processed = 0
-    batch = {}
 
     for processed, value in enumerate(array):
         value = value.strip()
@@ -304,26 +585,32 @@ def nominatim_resolve_all(url, array, max_requests=MAX_NOMINATIM_REQUESTS):
 
         if len(value) > MAX_ADDRESS_LENGTH:
             continue
-        elif value in cache:
-            if cache[value] is not None:
-                locations.append(cache[value])
-        elif value in batch:
-            batch[value] += 1
+        elif value in values:
+            values[value] += 1
         else:
-            batch[value] = 1
-            if len(batch) == NOMINATIM_BATCH_SIZE:
-                not_found += _nominatim_batch(url, batch, locations, cache)
-                if len(cache) >= max_requests:
-                    break
+            values[value] = 1
+            if (
+                len(values) % NOMINATIM_BATCH_SIZE == 0
+                and len(values) >= max_requests
+            ):
+                break
 
-    if batch and len(cache) < max_requests:
-        not_found += _nominatim_batch(url, batch, locations, cache)
+    results, queried = nominatim.resolve(list(values))
+
+    locations = []
+    not_found = 0
+    for value, count in values.items():
+        loc = results[value]
+        if loc is not None:
+            locations.extend([loc] * count)
+        else:
+            not_found += 1
 
     logger.info(
         "Performed %d Nominatim queries in %fs (%d hits). Found %d/%d",
-        len(cache),
+        queried,
         time.perf_counter() - start,
-        len(cache) - not_found,
+        len(values) - not_found,
         len(locations),
         processed,
     )
@@ -342,6 +629,16 @@ def disambiguate_admin_areas(admin_areas):
     in the same parent area (for example, states of the same country, or
     counties in states of the same country).
     """
+    # Parents are looked up in the database, and candidates often share them
+    parents = {}
+
+    def get_parent_area(area):
+        try:
+            return parents[area]
+        except KeyError:
+            parent = parents[area] = area.get_parent_area()
+            return parent
+
     # Count possible options
     options = collections.Counter()
     for candidates in admin_areas:
@@ -349,10 +646,10 @@ def disambiguate_admin_areas(admin_areas):
         options_for_entry = set()
         for area in candidates:
             level = area.type.value
-            area = area.get_parent_area()
+            area = get_parent_area(area)
             while area:
                 options_for_entry.add((level, area))
-                area = area.get_parent_area()
+                area = get_parent_area(area)
             options_for_entry.add((level, None))
         options.update(options_for_entry)
 
@@ -403,6 +700,193 @@ def disambiguate_admin_areas(admin_areas):
     return level, result
 
 
+def area_to_tuple(area):
+    """Turn a `datamart_geo.Area` into a tuple, which can be serialized.
+    """
+    return (
+        area.id, area.name, area.type.value, area.levels,
+        area.latitude, area.longitude, area.bounds,
+    )
+
+
+def area_from_tuple(geo_data, area):
+    """Get a `datamart_geo.Area` back from `area_to_tuple()`.
+    """
+    from datamart_geo import Area, Type
+
+    return Area(
+        geo_data, area[0], area[1], Type(area[2]),
+        *area[3:],
+    )
+
+
+class CachedGeoData(object):
+    """Wrap a `datamart_geo.GeoData` object, caching name resolution.
+
+    The same names come up in many datasets, so the areas they resolve to
+    are kept in memory, evicting the least recently used. They can also be
+    stored in a SQLite file, which can be shared by multiple processes and
+    kept between runs.
+
+    Other attributes are forwarded to the wrapped object, so this can be used
+    in place of a GeoData object.
+
+    :param geo_data: The `datamart_geo.GeoData` object
+    :param path: Path to a SQLite file to also keep the resolved names in
+    :param size: Number of names to keep in memory
+    """
+    def __init__(self, geo_data, path=None, *, size=ADMIN_CACHE_SIZE):
+        self.geo_data = geo_data
+        self.path = path
+        self.size = size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._thread_local = threading.local()
+        if path is not None:
+            self._setup_database()
+
+    def __getattr__(self, name):
+        if name == 'geo_data':
+            raise AttributeError(name)
+        return getattr(self.geo_data, name)
+
+    @property
+    def _database(self):
+        # SQLite3 connections can't be shared between threads
+        try:
+            return self._thread_local.database
+        except AttributeError:
+            database = sqlite3.connect(self.path, timeout=60)
+            self._thread_local.database = database
+            return database
+
+    def _setup_database(self):
+        # Identify the geo data, so the cache is emptied if it changes
+        stat = os.stat(os.path.join(self.geo_data._data_path, 'admins.gpkg'))
+        data_version = '%d %d' % (stat.st_size, stat.st_mtime_ns)
+
+        with self._database as database:
+            database.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS info(
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                '''
+            )
+            database.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS names(
+                    name TEXT PRIMARY KEY,
+                    areas TEXT NOT NULL
+                );
+                '''
+            )
+            row = database.execute(
+                "SELECT value FROM info WHERE key = 'data_version';"
+            ).fetchone()
+            if row is None or row[0] != data_version:
+                if row is not None:
+                    logger.info("Geo data changed, clearing cache")
+                database.execute("DELETE FROM names;")
+                database.execute(
+                    '''
+                    INSERT OR REPLACE INTO info(key, value)
+                    VALUES('data_version', ?);
+                    ''',
+                    (data_version,),
+                )
+
+    def _load(self, keys):
+        """Get resolved names from the SQLite file.
+        """
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            cur = self._database.execute(
+                'SELECT name, areas FROM names WHERE name IN (%s);' % (
+                    ', '.join('?' for _ in batch)
+                ),
+                batch,
+            )
+            for key, areas in cur:
+                # JSON turns the levels and bounds into lists
+                found[key] = [
+                    (
+                        id, name, type, tuple(levels),
+                        latitude, longitude,
+                        None if bounds is None else tuple(bounds),
+                    )
+                    for (
+                        id, name, type, levels,
+                        latitude, longitude, bounds,
+                    ) in json.loads(areas)
+                ]
+        return found
+
+    def _store(self, resolved):
+        """Add resolved names to the SQLite file.
+        """
+        with self._database as database:
+            database.executemany(
+                'INSERT OR REPLACE INTO names(name, areas) VALUES(?, ?);',
+                [
+                    (key, json.dumps(areas))
+                    for key, areas in resolved.items()
+                ],
+            )
+
+    def resolve_names_all(self, names):
+        """Get all the areas each name could refer to.
+
+        This is the same as ``GeoData.resolve_names_all()``.
+        """
+        from datamart_geo import normalize
+
+        keys = [normalize(name) for name in names]
+
+        # Look up memory
+        results = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[key] = self._cache[key]
+        missing = set(keys) - results.keys()
+
+        # Look up SQLite file
+        if missing and self.path is not None:
+            found = self._load(missing)
+            results.update(found)
+            missing -= found.keys()
+
+        # Resolve the rest
+        if missing:
+            resolved = {
+                key: [
+                    area_to_tuple(area)
+                    for area in self.geo_data.resolve_name_all(key)
+                ]
+                for key in missing
+            }
+            results.update(resolved)
+            if self.path is not None:
+                self._store(resolved)
+
+        with self._lock:
+            for key, areas in results.items():
+                self._cache[key] = areas
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+
+        return [
+            [area_from_tuple(self.geo_data, area) for area in results[key]]
+            for key in keys
+        ]
+
+
 GEOHASH_CHARS = '0123456789bcdefghjkmnpqrstuvwxyz'
 assert len(GEOHASH_CHARS) == 32
 GEOHASH_CHAR_VALUES = {c: i for i, c in enumerate(GEOHASH_CHARS)}
@@ -459,6 +943,46 @@ def location_to_bits(point, base, precision):
     return bits
 
 
+def locations_to_codes(points, base, precision):
+    """Vectorized version of ``location_to_bits()``.
+
+    :param points: Array of ``(lat, long)`` pairs, with shape ``(n, 2)``
+    :return: Array of integers, containing the bits for each point, first bit
+        in the most significant position
+    """
+    base_bits = base.bit_length() - 1
+    if 2 ** base_bits != base:
+        raise ValueError("Base is not a power of 2")
+    precision_bits = base_bits * precision
+    if precision_bits > 64:
+        raise ValueError("Precision is too high")
+
+    points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+    latitude = points[:, 0]
+    longitude = points[:, 1]
+
+    # Same bisection as location_to_bits(), on all the points at once
+    lat_min = numpy.full(len(points), -90.0)
+    lat_max = numpy.full(len(points), 90.0)
+    long_min = numpy.full(len(points), -180.0)
+    long_max = numpy.full(len(points), 180.0)
+    codes = numpy.zeros(len(points), dtype=numpy.uint64)
+    with numpy.errstate(invalid='ignore'):
+        for i in range(precision_bits):
+            if i % 2 == 0:
+                mid = (long_min + long_max) / 2.0
+                bit = longitude > mid
+                long_min = numpy.where(bit, mid, long_min)
+                long_max = numpy.where(bit, long_max, mid)
+            else:
+                mid = (lat_min + lat_max) / 2.0
+                bit = latitude > mid
+                lat_min = numpy.where(bit, mid, lat_min)
+                lat_max = numpy.where(bit, lat_max, mid)
+            codes = (codes << numpy.uint64(1)) | bit.astype(numpy.uint64)
+    return codes
+
+
 def hash_location(point, base=32, precision=16):
     """Hash coordinates into short strings usable for prefix search.
 
@@ -521,6 +1045,39 @@ def bitrange(from_bits, to_bits):
     yield bits
 
 
+def _bits_range(from_value, to_value, nb_bits):
+    """Same as ``bitrange()``, on integers.
+    """
+    if from_value <= to_value:
+        return range(from_value, to_value + 1)
+    else:
+        # Wraps around
+        return itertools.chain(
+            range(from_value, 1 << nb_bits),
+            range(0, to_value + 1),
+        )
+
+
+def _cell_chars(long_value, lat_value, n_long_bits, n_lat_bits, base_bits,
+                start=0):
+    """Get the hash of a cell from its longitude and latitude bits.
+
+    :param start: The first character to return
+    """
+    chars = []
+    for i in range(start, (n_long_bits + n_lat_bits) // base_bits):
+        char = 0
+        for pos in range(i * base_bits, (i + 1) * base_bits):
+            # Bits alternate, starting with longitude
+            if pos % 2 == 0:
+                bit = long_value >> (n_long_bits - 1 - pos // 2)
+            else:
+                bit = lat_value >> (n_lat_bits - 1 - pos // 2)
+            char = (char << 1) | (bit & 1)
+        chars.append(GEOHASH_CHARS[char])
+    return ''.join(chars)
+
+
 class Geohasher(object):
     def __init__(self, *, number, base=4, precision=16):
         self.number = number
@@ -531,25 +1088,131 @@ class Geohasher(object):
         self.number_at_level = [0] * (precision)
 
     def add_points(self, points):
-        for point in points:
-            geohash = hash_location(point, self.base, self.precision)
-            # Add this hash to the tree
-            node = self.tree_root
-            for level, key in enumerate(geohash):
-                node[0] += 1
-                try:
-                    node = node[1][key]
-                except KeyError:
-                    new_node = [0, {}]
-                    node[1][key] = new_node
-                    node = new_node
-                    self.number_at_level[level] += 1
-
-                    # If this level has too many nodes, stop building it
-                    if self.number_at_level[level] > self.number:
-                        self.precision = level
-                        break
+        base_bits = self.base.bit_length() - 1
+        if base_bits * self.precision > 64:
+            for point in points:
+                self._add_point(point)
+            return
+
+        points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+        if not len(points):
+            return
+        precision = self.precision
+        nb_bits = base_bits * precision
+        codes = locations_to_codes(points, self.base, precision)
+
+        # Sort the points, so that the points sharing a prefix are contiguous
+        # at every level
+        order = numpy.argsort(codes, kind='stable')
+        codes_sorted = codes[order]
+        existing = self._codes_by_level(precision)
+
+        # Adding points one by one, the tree stops growing when a level gets
+        # more than `number` nodes, at the first level where that happens.
+        # Find, for each level, which point would cause that
+        overflow_at = {}
+        for level in range(precision):
+            shift = numpy.uint64(nb_bits - (level + 1) * base_bits)
+            prefixes = codes_sorted >> shift
+            starts = numpy.flatnonzero(
+                numpy.concatenate([[True], prefixes[1:] != prefixes[:-1]])
+            )
+            needed = self.number + 1 - self.number_at_level[level]
+            if len(starts) < needed:
+                continue
+            # Index of the first point with each prefix that is not in the tree
+            new = ~numpy.isin(prefixes[starts], existing[level])
+            first_points = numpy.minimum.reduceat(order, starts)[new]
+            needed = max(needed, 1)
+            if len(first_points) >= needed:
+                overflow_at[level] = numpy.partition(
+                    first_points, needed - 1,
+                )[needed - 1]
+
+        # Follow the precision going down as the points would be added, each
+        # time to the first level to overflow among the remaining ones
+        while True:
+            candidates = [
+                (point_idx, level)
+                for level, point_idx in overflow_at.items()
+                if level < precision
+            ]
+            if not candidates:
+                break
+            _, precision = min(candidates)
+        self.precision = precision
+
+        # Add the prefixes at the final precision to the tree, in the order
+        # they appear
+        if precision == 0:
+            prefixes = numpy.zeros(len(codes_sorted), dtype=numpy.uint64)
+        else:
+            shift = numpy.uint64(nb_bits - precision * base_bits)
+            prefixes = codes_sorted >> shift
+        starts = numpy.flatnonzero(
+            numpy.concatenate([[True], prefixes[1:] != prefixes[:-1]])
+        )
+        first_points = numpy.minimum.reduceat(order, starts)
+        counts = numpy.diff(numpy.append(starts, len(prefixes)))
+        for i in numpy.argsort(first_points):
+            geohash = bits_to_chars(
+                [
+                    (int(prefixes[starts[i]]) >> j) & 1
+                    for j in range(precision * base_bits - 1, -1, -1)
+                ],
+                base_bits,
+            )
+            self._add_hash(geohash, int(counts[i]))
+
+    def _add_point(self, point):
+        geohash = hash_location(point, self.base, self.precision)
+        # Add this hash to the tree
+        node = self.tree_root
+        for level, key in enumerate(geohash):
             node[0] += 1
+            try:
+                node = node[1][key]
+            except KeyError:
+                new_node = [0, {}]
+                node[1][key] = new_node
+                node = new_node
+                self.number_at_level[level] += 1
+
+                # If this level has too many nodes, stop building it
+                if self.number_at_level[level] > self.number:
+                    self.precision = level
+                    break
+        node[0] += 1
+
+    def _add_hash(self, geohash, count):
+        node = self.tree_root
+        node[0] += count
+        for level, key in enumerate(geohash):
+            try:
+                node = node[1][key]
+            except KeyError:
+                new_node = [0, {}]
+                node[1][key] = new_node
+                node = new_node
+                self.number_at_level[level] += 1
+            node[0] += count
+
+    def _codes_by_level(self, precision):
+        """Get the nodes already in the tree, as integers, for each level.
+        """
+        base_bits = self.base.bit_length() - 1
+        codes = [[] for _ in range(precision)]
+
+        def add_node(code, node, level):
+            if level == precision:
+                return
+            for k, n in node[1].items():
+                child_code = (code << base_bits) | GEOHASH_CHAR_VALUES[k]
+                codes[level].append(child_code)
+                add_node(child_code, n, level + 1)
+
+        add_node(0, self.tree_root, 0)
+        return [numpy.array(c, dtype=numpy.uint64) for c in codes]
 
     def add_aab(self, box):
         base_bits = self.base.bit_length() - 1
@@ -558,48 +1221,88 @@ class Geohasher(object):
         min_bits = location_to_bits(
             (min_lat, min_long), self.base, self.precision,
         )
-        min_long_bits = min_bits[0::2]
-        min_lat_bits = min_bits[1::2]
         max_bits = location_to_bits(
             (max_lat, max_long), self.base, self.precision,
         )
-        max_long_bits = max_bits[0::2]
-        max_lat_bits = max_bits[1::2]
+        # Turn the bits into integers
+        min_long_value = max_long_value = 0
+        for bit in min_bits[0::2]:
+            min_long_value = (min_long_value << 1) | bit
+        for bit in max_bits[0::2]:
+            max_long_value = (max_long_value << 1) | bit
+        min_lat_value = max_lat_value = 0
+        for bit in min_bits[1::2]:
+            min_lat_value = (min_lat_value << 1) | bit
+        for bit in max_bits[1::2]:
+            max_lat_value = (max_lat_value << 1) | bit
+        total_long_bits = len(min_bits[0::2])
+        total_lat_bits = len(min_bits[1::2])
 
         self.tree_root[0] += 1
+        # Cells of the previous level by coordinates, as (hash, node), so the
+        # cells of the next level don't have to walk down from the root
+        parents = {(0, 0): ('', self.tree_root)}
+        prev_long_bits = prev_lat_bits = 0
         level = 1
         while level <= self.precision:
             n_long_bits = math.ceil(level * base_bits / 2)
             n_lat_bits = math.floor(level * base_bits / 2)
-            for long_bits in bitrange(
-                    min_long_bits[:n_long_bits],
-                    max_long_bits[:n_long_bits],
+            long_shift = total_long_bits - n_long_bits
+            lat_shift = total_lat_bits - n_lat_bits
+            lat_values = list(_bits_range(
+                min_lat_value >> lat_shift,
+                max_lat_value >> lat_shift,
+                n_lat_bits,
+            ))
+            cells = {}
+            # A single loop, so stopping early skips the other longitudes too
+            for long_value, lat_value in itertools.product(
+                    _bits_range(
+                        min_long_value >> long_shift,
+                        max_long_value >> long_shift,
+                        n_long_bits,
+                    ),
+                    lat_values,
             ):
-                for lat_bits in bitrange(
-                        min_lat_bits[:n_lat_bits],
-                        max_lat_bits[:n_lat_bits],
-                ):
-                    bits = [0] * (n_long_bits + n_lat_bits)
-                    bits[0::2] = long_bits
-                    bits[1::2] = lat_bits
-                    geohash = bits_to_chars(bits, base_bits)
-
-                    # Add this hash to the tree
+                parent = parents.get((
+                    long_value >> (n_long_bits - prev_long_bits),
+                    lat_value >> (n_lat_bits - prev_lat_bits),
+                ))
+                if parent is not None:
+                    geohash = parent[0] + _cell_chars(
+                        long_value, lat_value,
+                        n_long_bits, n_lat_bits, base_bits,
+                        start=level - 1,
+                    )
+                    node = parent[1]
+                    key_level = level - 1
+                else:
+                    geohash = _cell_chars(
+                        long_value, lat_value,
+                        n_long_bits, n_lat_bits, base_bits,
+                    )
                     node = self.tree_root
-                    for lvl, key in enumerate(geohash):
-                        try:
-                            node = node[1][key]
-                        except KeyError:
-                            new_node = [0, {}]
-                            node[1][key] = new_node
-                            node = new_node
-                            self.number_at_level[lvl] += 1
-                    node[0] += 1
-
-                    if self.number_at_level[level - 1] > self.number:
-                        self.precision = level - 1
-                        break
+                    key_level = 0
+
+                # Add this hash to the tree
+                for lvl in range(key_level, level):
+                    key = geohash[lvl]
+                    try:
+                        node = node[1][key]
+                    except KeyError:
+                        new_node = [0, {}]
+                        node[1][key] = new_node
+                        node = new_node
+                        self.number_at_level[lvl] += 1
+                node[0] += 1
+                cells[(long_value, lat_value)] = geohash, node
+
+                if self.number_at_level[level - 1] > self.number:
+                    self.precision = level - 1
+                    break
 
+            parents = cells
+            prev_long_bits, prev_lat_bits = n_long_bits, n_lat_bits
             level += 1
 
     def get_hashes(self):
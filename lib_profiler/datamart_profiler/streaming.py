@@ -0,0 +1,332 @@
+"""Profile a whole file in a streaming fashion.
+
+Types are detected on a sample of the data that fits in memory, see
+``process_dataset()``. The functions here then read the whole file again in
+chunks, updating bounded-memory sketches from :mod:`.sketches`, and replace the
+distinct counts, statistics, ranges, plots and coverage with the ones computed
+over all the rows. The metadata keeps the same format.
+"""
+
+from datetime import datetime
+import dateutil.tz
+import logging
+import numpy
+import opentelemetry.trace
+import pandas
+
+from .numerical import get_numerical_ranges
+from .profile_types import distinct_values_counts, parse_numbers
+from .sketches import HyperLogLog, QuantileSketch, Moments, TopK, Reservoir
+from .spatial import Geohasher, get_spatial_ranges, parse_wkt_column
+from .temporal import parse_dates_all
+from . import types
+
+
+try:
+    import pyarrow
+    import pyarrow.compute
+except ImportError:
+    pyarrow = None
+
+
+logger = logging.getLogger(__name__)
+tracer = opentelemetry.trace.get_tracer(__name__)
+
+
+TOP_VALUES = 1000
+"""Number of values tracked for categorical and text plots"""
+
+SPATIAL_SAMPLE_SIZE = 10000
+"""Number of points kept to compute spatial ranges"""
+
+
+def _parse_numbers(array):
+    numbers = parse_numbers(array)
+    return numbers[(-3.4e38 < numbers) & (numbers < 3.4e38)]
+
+
+def _parse_timestamps(values, counts, years):
+    timestamps = []
+    timestamps_counts = []
+    for value, count, dt in zip(values, counts, parse_dates_all(values)):
+        if dt is None and years:
+            try:
+                dt = datetime(int(value), 1, 1, tzinfo=dateutil.tz.UTC)
+            except ValueError:
+                pass
+        if dt is None:
+            continue
+        timestamps.append(dt.timestamp())
+        timestamps_counts.append(count)
+    return numpy.repeat(
+        numpy.array(timestamps, dtype=numpy.float64),
+        numpy.array(timestamps_counts, dtype=numpy.int64),
+    )
+
+
+def _count_words_arrow(values, counts):
+    try:
+        array = pyarrow.array(values, type=pyarrow.string())
+    except (TypeError, ValueError):
+        return None  # Not all strings
+    # Python's \W and lower() only match what Arrow does for ASCII
+    if not pyarrow.compute.all(pyarrow.compute.string_is_ascii(array)).as_py():
+        return None
+    lists = pyarrow.compute.split_pattern_regex(
+        pyarrow.compute.ascii_lower(array),
+        pattern=r'\W+',
+    )
+    words = pyarrow.compute.list_flatten(lists).to_numpy(zero_copy_only=False)
+    counts = numpy.asarray(counts)[
+        pyarrow.compute.list_parent_indices(lists).to_numpy()
+    ]
+    non_empty = words != ''
+    return words[non_empty], counts[non_empty]
+
+
+def count_words(values, counts):
+    """Split values into lowercase words, for text plots.
+
+    :return: A tuple ``(words, counts)``, where a word can appear multiple
+        times
+    """
+    if pyarrow is not None and len(values):
+        words = _count_words_arrow(values, counts)
+        if words is not None:
+            return words
+    # Split before lowercasing, lower() can change what \W matches
+    words = pandas.DataFrame({
+        'word': pandas.Series(values, dtype=object).str.split(r'\W+'),
+        'count': counts,
+    }).explode('word')
+    words['word'] = words['word'].str.lower()
+    words = words[words['word'].astype(bool)]
+    return words['word'].values, words['count'].values
+
+
+class ColumnSketches(object):
+    """The sketches needed to update the metadata of one column.
+    """
+    def __init__(self, column_meta, temporal):
+        self.column_meta = column_meta
+        plot_type = column_meta.get('plot', {}).get('type')
+        # Year numbers are recognized as dates in columns named "year"
+        self.years = column_meta['name'].strip().lower() == 'year'
+
+        self.empty = 0
+
+        self.distinct = None
+        if 'num_distinct_values' in column_meta:
+            self.distinct = HyperLogLog()
+
+        self.moments = None
+        self.numbers = None
+        if column_meta['structural_type'] in (types.INTEGER, types.FLOAT):
+            if 'mean' in column_meta:
+                self.moments = Moments()
+            if 'mean' in column_meta or plot_type == 'histogram_numerical':
+                self.numbers = QuantileSketch()
+
+        self.timestamps = None
+        if temporal or plot_type == 'histogram_temporal':
+            self.timestamps = QuantileSketch()
+
+        self.values = None
+        if plot_type == 'histogram_categorical':
+            self.values = TopK(TOP_VALUES)
+
+        self.words = None
+        if plot_type == 'histogram_text':
+            self.words = TopK(TOP_VALUES)
+
+    def add(self, array):
+        self.empty += int((array == '').sum())
+
+        if self.moments is not None or self.numbers is not None:
+            numbers = _parse_numbers(array)
+            if self.moments is not None:
+                self.moments.add(numbers)
+            if self.numbers is not None:
+                self.numbers.add(numbers)
+
+        if not any([self.distinct, self.timestamps, self.values, self.words]):
+            return
+        values, counts = distinct_values_counts(array)
+        non_empty = values != ''
+        values, counts = values[non_empty], counts[non_empty]
+        if self.distinct is not None:
+            self.distinct.add(values)
+        if self.timestamps is not None:
+            self.timestamps.add(_parse_timestamps(values, counts, self.years))
+        if self.values is not None:
+            self.values.add(values, counts)
+        if self.words is not None:
+            self.words.add(*count_words(values, counts))
+
+    def update_metadata(self, nb_rows):
+        column_meta = self.column_meta
+        if column_meta['structural_type'] != types.MISSING_DATA:
+            if self.empty:
+                column_meta['missing_values_ratio'] = self.empty / nb_rows
+            else:
+                column_meta.pop('missing_values_ratio', None)
+
+        if self.distinct is not None:
+            # The estimate can be off by a few percent, in either direction
+            column_meta['num_distinct_values'] = min(
+                self.distinct.count(),
+                nb_rows - self.empty,
+            )
+
+        if self.moments is not None:
+            column_meta['mean'] = self.moments.mean
+            column_meta['stddev'] = self.moments.stddev
+            ranges = get_numerical_ranges(self.numbers.sample())
+            if ranges:
+                column_meta['coverage'] = ranges
+
+        plot_type = column_meta.get('plot', {}).get('type')
+        if plot_type == 'histogram_numerical' and self.numbers.count:
+            counts, edges = self.numbers.histogram(bins=10)
+            column_meta['plot']['data'] = [
+                {
+                    "count": int(count),
+                    "bin_start": float(edges[i]),
+                    "bin_end": float(edges[i + 1]),
+                }
+                for i, count in enumerate(counts)
+            ]
+        elif plot_type == 'histogram_temporal' and self.timestamps.count:
+            counts, edges = self.timestamps.histogram(bins=10)
+            column_meta['plot']['data'] = [
+                {
+                    "count": int(count),
+                    "date_start": datetime.utcfromtimestamp(
+                        float(edges[i]),
+                    ).isoformat(),
+                    "date_end": datetime.utcfromtimestamp(
+                        float(edges[i + 1]),
+                    ).isoformat(),
+                }
+                for i, count in enumerate(counts)
+            ]
+        elif plot_type == 'histogram_categorical':
+            counts = sorted(self.values.most_common(5))
+            column_meta['plot']['data'] = [
+                {
+                    "bin": value,
+                    "count": count,
+                }
+                for value, count in counts
+            ]
+        elif plot_type == 'histogram_text':
+            counts = self.words.most_common(5)
+            column_meta['plot']['data'] = [
+                {
+                    "bin": value,
+                    "count": count,
+                }
+                for value, count in counts
+            ]
+
+
+class PointSketches(object):
+    """The sketches needed to update a spatial coverage entry from points.
+    """
+    def __init__(self, coverage, max_geohashes):
+        self.coverage = coverage
+        self.geohasher = Geohasher(number=max_geohashes)
+        self.sample = Reservoir(SPATIAL_SAMPLE_SIZE)
+        self.number = 0
+
+    def add(self, chunk):
+        cov = self.coverage
+        if cov['type'] == 'latlong':
+            lat_idx, long_idx = cov['column_indexes']
+            lat_values = parse_numbers(chunk.iloc[:, lat_idx])
+            long_values = parse_numbers(chunk.iloc[:, long_idx])
+            with numpy.errstate(invalid='ignore'):
+                mask = (
+                    (-90.0 < lat_values) & (lat_values < 90.0)
+                    & (-180.0 < long_values) & (long_values < 180.0)
+                )
+            points = numpy.array([lat_values[mask], long_values[mask]]).T
+        else:
+            idx, = cov['column_indexes']
+            points = parse_wkt_column(
+                chunk.iloc[:, idx],
+                latlong=cov['type'] == 'point_latlong',
+            )
+        if len(points):
+            self.geohasher.add_points(points)
+            self.sample.add(points)
+            self.number += len(points)
+
+    def update_metadata(self):
+        if self.number:
+            self.coverage['ranges'] = get_spatial_ranges(self.sample.rows)
+            self.coverage['geohashes4'] = self.geohasher.get_hashes_json()
+            self.coverage['number'] = self.number
+
+
+def profile_stream(data, metadata, *, chunk_rows, max_geohashes,
+                   string_dtype=str):
+    """Update the metadata of a dataset from all of its rows.
+
+    :param data: A file object, at the start of the CSV file
+    :param metadata: The metadata computed on a sample, updated in place
+    :param chunk_rows: Number of rows to read at a time
+    :param max_geohashes: Maximum number of geohashes for spatial coverage
+    :param string_dtype: The dtype to read the values as, e.g.
+        ``string[pyarrow]``
+    """
+    columns = metadata['columns']
+
+    temporal_indexes = set()
+    for cov in metadata.get('temporal_coverage', []):
+        temporal_indexes.update(cov['column_indexes'])
+    column_sketches = [
+        ColumnSketches(column_meta, idx in temporal_indexes)
+        for idx, column_meta in enumerate(columns)
+    ]
+    point_sketches = [
+        PointSketches(cov, max_geohashes)
+        for cov in metadata.get('spatial_coverage', [])
+        if cov['type'] in ('latlong', 'point', 'point_latlong')
+    ]
+
+    nb_rows = 0
+    chunks = pandas.read_csv(
+        data,
+        dtype=string_dtype, na_filter=False,
+        chunksize=chunk_rows,
+    )
+    for chunk in chunks:
+        with tracer.start_as_current_span('profile/stream_chunk'):
+            logger.info("Profiling chunk, %d rows", chunk.shape[0])
+            if chunk.shape[1] != len(columns):
+                raise ValueError("Chunk doesn't match number of columns")
+            nb_rows += chunk.shape[0]
+            for idx, sketches in enumerate(column_sketches):
+                sketches.add(chunk.iloc[:, idx])
+            for sketches in point_sketches:
+                sketches.add(chunk)
+
+    for sketches in column_sketches:
+        sketches.update_metadata(nb_rows)
+    for sketches in point_sketches:
+        sketches.update_metadata()
+
+    for cov in metadata.get('temporal_coverage', []):
+        idx, = cov['column_indexes']
+        timestamps = column_sketches[idx].timestamps
+        if timestamps.count:
+            ranges = get_numerical_ranges(timestamps.sample())
+            if ranges:
+                cov['ranges'] = ranges
+
+    metadata['nb_rows'] = nb_rows
+    metadata['nb_profiled_rows'] = nb_rows
+    if nb_rows > 0:
+        metadata['average_row_size'] = metadata['size'] / nb_rows
+    logger.info("Profiled %d rows in streaming mode", nb_rows)
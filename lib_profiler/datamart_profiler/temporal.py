@@ -1,8 +1,10 @@
-import collections
 from datetime import datetime
 import dateutil.parser
 import dateutil.tz
+import functools
+import itertools
 import logging
+import numpy
 import pandas
 
 from .warning_tools import raise_warnings
@@ -33,15 +35,86 @@ temporal_aggregation_keys = {
 }
 
 
+def _truncate(unit):
+    return lambda wall_times: wall_times.astype('datetime64[%s]' % unit)
+
+
+def _truncate_quarter(wall_times):
+    months = wall_times.astype('datetime64[M]').astype(numpy.int64)
+    # Month 0 is January 1970
+    return months - months % 3
+
+
+def _truncate_week(wall_times):
+    days = wall_times.astype('datetime64[D]').astype(numpy.int64)
+    # Day 0 is Thursday January 1st 1970, map each day to its week's Monday
+    return days - (days + 3) % 7
+
+
+# Same bins as temporal_aggregation_keys, computed on NumPy arrays
+_temporal_truncations = {
+    'year': _truncate('Y'),
+    'quarter': _truncate_quarter,
+    'month': _truncate('M'),
+    'week': _truncate_week,
+    'day': _truncate('D'),
+    'hour': _truncate('h'),
+    'minute': _truncate('m'),
+    'second': _truncate('s'),
+}
+
+
+# Day number of 1970-01-01 in the proleptic Gregorian calendar
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+def _distinct_wall_times(values):
+    """Get the distinct values as a datetime64 array of their local times.
+
+    Values are distinct by instant, but bins are computed from the time in
+    each value's own timezone, like ``strftime()`` does.
+
+    :return: A tuple ``(wall_times, mixed_values)`` where `mixed_values` is
+        the set of distinct values if they have different timezones, else
+        None.
+    """
+    if isinstance(values, pandas.DatetimeIndex):
+        values = values.unique()
+        if values.tz is not None:
+            values = values.tz_localize(None)
+        return values.values.astype('datetime64[us]'), None
+
+    # With a single timezone, instants are distinct if local times are, so
+    # the Python set can be skipped
+    single_timezone = len({id(value.tzinfo) for value in values}) == 1
+    if not single_timezone:
+        values = set(values)
+    # Build microseconds since the epoch from the fields, converting Python
+    # objects into datetime64 directly is slow
+    wall_times = numpy.array(
+        [
+            (
+                (value.toordinal() - _EPOCH_ORDINAL) * 86400
+                + value.hour * 3600 + value.minute * 60 + value.second
+            ) * 1000000 + value.microsecond
+            for value in values
+        ],
+        dtype=numpy.int64,
+    )
+    if single_timezone:
+        return numpy.unique(wall_times).astype('datetime64[us]'), None
+    else:
+        return wall_times.astype('datetime64[us]'), values
+
+
 def get_temporal_resolution(values):
     """Returns the resolution of the temporal attribute.
     """
 
-    if not isinstance(values, set):
-        values = set(values)
+    wall_times, mixed_values = _distinct_wall_times(values)
 
-    if len(values) == 1:
-        value, = values
+    if len(wall_times) == 1:
+        value = wall_times[0].item()
         if value.second:
             return 'second'
         elif value.minute:
@@ -52,18 +125,16 @@ def get_temporal_resolution(values):
             return 'day'
 
     # Python 3.7+ iterates on dict in insertion order
-    for resolution, key in temporal_aggregation_keys.items():
-        counts = collections.defaultdict(collections.Counter)
-        if isinstance(key, str):
-            for value in values:
-                bin = value.strftime(key)
-                counts[bin][value] += 1
+    for resolution, truncate in _temporal_truncations.items():
+        if resolution == 'quarter' and mixed_values is not None:
+            # Quarters are datetimes in the value's timezone, which are
+            # compared as instants
+            key = temporal_aggregation_keys['quarter']
+            nb_bins = len({key(value) for value in mixed_values})
         else:
-            for value in values:
-                bin = key(value)
-                counts[bin][value] += 1
+            nb_bins = len(numpy.unique(truncate(wall_times)))
 
-        avg_per_bin = sum(len(v) for v in counts.values()) / len(counts)
+        avg_per_bin = len(wall_times) / nb_bins
         if avg_per_bin < 1.05:
             # 5 % error tolerated
             return resolution
@@ -74,6 +145,7 @@ def get_temporal_resolution(values):
 _defaults = datetime(1985, 1, 1), datetime(2005, 6, 1)
 
 
+@functools.lru_cache(maxsize=100000)
 def parse_date(string):
     """Parse a full date from a string.
 
@@ -100,3 +172,107 @@ def parse_date(string):
     if dt1.tzinfo is None:
         dt1 = dt1.replace(tzinfo=dateutil.tz.UTC)
     return dt1
+
+
+# Formats tried by parse_dates_all(), they are only used if they give the same
+# result as parse_date() on a sample
+DATE_FORMATS = [
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%dT%H:%M',
+    '%Y/%m/%d',
+    '%m/%d/%Y',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %H:%M',
+    '%Y-%m',
+    '%Y%m%d',
+]
+
+# Number of values used to select a format
+DATE_FORMAT_SAMPLE_SIZE = 20
+
+
+def _parse_format(values, date_format):
+    """Parse strings that exactly match a format.
+
+    :param values: A ``pandas.Series`` of strings
+    :return: A tuple ``(timestamps, matched)``, where `timestamps` is a
+        ``pandas.Series`` and `matched` a boolean NumPy array.
+    """
+    parsed = pandas.to_datetime(
+        values,
+        format=date_format,
+        errors='coerce',
+        utc=True,
+    )
+    # Pandas is lenient with some formats (e.g. ISO 8601, timezones), so
+    # check that formatting the result gives back the string
+    matched = (
+        numpy.asarray(parsed.dt.strftime(date_format), dtype=object)
+        == numpy.asarray(values, dtype=object)
+    )
+    return parsed, matched
+
+
+def infer_date_format(values):
+    """Find a format matching the dates in an array of strings.
+
+    The format is checked against `parse_date()` on a sample, so using it
+    doesn't change the result.
+
+    :return: A format from `DATE_FORMATS`, or None
+    """
+    values = pandas.Series(values, dtype=object)
+    sample = values[values != ''].iloc[:DATE_FORMAT_SAMPLE_SIZE]
+    if not len(sample):
+        return None
+    expected = [parse_date(value) for value in sample]
+
+    best_format = None
+    best_matches = 0
+    for date_format in DATE_FORMATS:
+        parsed, matched = _parse_format(sample, date_format)
+        matches = 0
+        for timestamp, dt in zip(parsed[matched], itertools.compress(
+            expected, matched,
+        )):
+            if dt is None or timestamp.to_pydatetime() != dt:
+                # This format disagrees with parse_date(), don't use it
+                matches = 0
+                break
+            matches += 1
+        if matches > best_matches:
+            best_format = date_format
+            best_matches = matches
+    return best_format
+
+
+def parse_dates_all(values, date_format='infer'):
+    """Parse full dates from an array of strings.
+
+    This gives the same result as calling `parse_date()` on each value, but
+    values matching a common format are parsed all at once.
+
+    :param date_format: The format to try first, from `infer_date_format()`.
+        By default it is inferred from the values.
+    :return: A list of datetimes, or None where the value is not a date
+    """
+    values = pandas.Series(values, dtype=object)
+    result = numpy.full(len(values), None, dtype=object)
+    remaining = numpy.ones(len(values), dtype=bool)
+
+    if date_format == 'infer':
+        date_format = infer_date_format(values)
+    if date_format is not None:
+        parsed, matched = _parse_format(values, date_format)
+        result[matched] = [
+            dt.replace(tzinfo=dateutil.tz.UTC)
+            for dt in parsed[matched].dt.to_pydatetime()
+        ]
+        remaining &= ~matched
+
+    for idx in numpy.flatnonzero(remaining):
+        result[idx] = parse_date(values.iloc[idx])
+    return result.tolist()
@@ -26,6 +26,7 @@ from datamart_geo import GeoData
 from datamart_materialize import DatasetTooBig
 from datamart_materialize.detect import detect_format_convert_to_csv
 from datamart_profiler import process_dataset
+from datamart_profiler.spatial import NominatimClient
 
 
 logger = logging.getLogger(__name__)
@@ -184,7 +185,10 @@ class Profiler(object):
             port=int(os.environ['LAZO_SERVER_PORT'])
         )
         if os.environ.get('NOMINATIM_URL'):
-            self.nominatim = os.environ['NOMINATIM_URL']
+            self.nominatim = NominatimClient(
+                os.environ['NOMINATIM_URL'],
+                '/cache/nominatim.sqlite3',
+            )
         else:
             self.nominatim = None
             logger.warning(
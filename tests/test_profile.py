@@ -1,26 +1,37 @@
+import collections
 import contextlib
 import csv
 from datetime import datetime
 from dateutil.tz import UTC
 import io
+import numpy
 import os
 import pandas
 import random
+import re
 import requests
 import tempfile
 import textwrap
+import threading
+import time
 import unittest
+from unittest import mock
 
 import datamart_geo
-from datamart_profiler import process_dataset
+from datamart_profiler import FileProbe, process_dataset
+from datamart_profiler.cache import ProfileCache
 from datamart_profiler.core import expand_attribute_name, load_data
+from datamart_profiler.numerical import get_numerical_ranges, mean_stddev
+from datamart_profiler import core
 from datamart_profiler import profile_types
+from datamart_profiler import sketches
 from datamart_profiler import spatial
+from datamart_profiler import temporal
 from datamart_profiler.spatial import LATITUDE, LONGITUDE, LatLongColumn, \
-    disambiguate_admin_areas
+    disambiguate_admin_areas, get_spatial_ranges, parse_wkt_column
 from datamart_profiler.temporal import get_temporal_resolution, parse_date
 
-from .utils import DataTestCase, data
+from .utils import DataTestCase, data, fake_nominatim
 
 
 def check_ranges(min_, max_):
@@ -123,6 +134,249 @@ class TestSample(unittest.TestCase):
             data, metadata, column_names = load_data(tmp.name, 6000)
             self.assertEqual(data.shape, (425, 2))
 
+    def test_sample_lines(self):
+        """Test that sampling selects whole rows, from paths or file objects"""
+        with self.random_data(1000) as (tmp, filesize):
+            data, metadata, column_names = load_data(tmp.name, 5000)
+            self.assertEqual(metadata['nb_rows'], 1001)
+            self.assertEqual(metadata['average_row_size'], filesize / 1001)
+            self.assertEqual(list(data.columns), ['id', 'number'])
+            ids = [int(i) for i in data['id']]
+            self.assertEqual(ids, sorted(set(ids)))
+            self.assertTrue(all(len(n) == 6 for n in data['number']))
+
+            tmp.seek(0, 0)
+            data_fp, metadata_fp, _ = load_data(tmp, 5000)
+            self.assertEqual(metadata_fp, metadata)
+            self.assertTrue(data_fp.equals(data))
+
+    def test_sample_quoted_newlines(self):
+        """Test that sampling doesn't split values with newlines"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'data.csv')
+            with open(path, 'w', newline='') as fp:
+                writer = csv.writer(fp)
+                writer.writerow(['id', 'text'])
+                for i in range(1000):
+                    if i % 3 == 0:
+                        writer.writerow([i, 'two\n"lines" %d' % i])
+                    else:
+                        writer.writerow([i, 'line %d' % i])
+
+            with FileProbe(path) as probe:
+                self.assertEqual(probe.header, ['id', 'text'])
+                self.assertEqual(probe.nb_lines, 1001)
+                self.assertEqual(probe.rows_to_skip, 0)
+                self.assertEqual(probe.dialect.delimiter, ',')
+
+                data, metadata, _ = load_data(probe, 5000)
+            self.assertEqual(metadata['nb_rows'], 1001)
+            self.assertLess(data.shape[0], 1000)
+            for i, text in zip(data['id'], data['text']):
+                self.assertTrue(text.endswith(' %s' % i))
+
+            with open(path, 'r') as fp:
+                _, metadata_fp, _ = load_data(fp, 5000)
+            self.assertEqual(metadata_fp, metadata)
+
+    def test_sample_stray_quotes(self):
+        """Test sampling with quotes inside unquoted values"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'data.csv')
+            with open(path, 'w', newline='') as fp:
+                fp.write('id,text\n')
+                for i in range(1000):
+                    if i == 7:
+                        fp.write('%d,pipe 12" long\n' % i)
+                    elif i == 500:
+                        fp.write('%d,12"\n' % i)
+                    elif i % 3 == 0:
+                        fp.write('%d,"quoted ""%d""\nvalue"\n' % (i, i))
+                    else:
+                        fp.write('%d,line %d\n' % (i, i))
+            filesize = os.stat(path).st_size
+
+            with FileProbe(path) as probe:
+                self.assertEqual(probe.nb_lines, 1001)
+                data, metadata, _ = load_data(probe, 5000)
+            self.assertEqual(metadata['nb_rows'], 1001)
+            self.assertEqual(metadata['average_row_size'], filesize / 1001)
+            self.assertGreater(data.shape[0], 100)
+            for i, text in zip(data['id'], data['text']):
+                i = int(i)
+                if i == 7:
+                    self.assertEqual(text, 'pipe 12" long')
+                elif i == 500:
+                    self.assertEqual(text, '12"')
+                elif i % 3 == 0:
+                    self.assertEqual(text, 'quoted "%d"\nvalue' % i)
+                else:
+                    self.assertEqual(text, 'line %d' % i)
+
+
+class TestStreaming(unittest.TestCase):
+    def test_streaming(self):
+        """Test profiling a whole file bigger than the sample size"""
+        with tempfile.NamedTemporaryFile('w+') as tmp:
+            writer = csv.writer(tmp)
+            writer.writerow(['id', 'color', 'number'])
+            rand = random.Random(3)
+            colors = ['red'] * 5 + ['green'] * 3 + ['blue'] * 2
+            for i in range(5000):
+                writer.writerow([i, colors[i % 10], rand.randint(0, 100)])
+            tmp.flush()
+
+            sampled = process_dataset(tmp.name, load_max_size=5000)
+            metadata = process_dataset(
+                tmp.name,
+                load_max_size=5000, streaming=True, plots=True,
+            )
+
+        self.assertLess(sampled['nb_profiled_rows'], 5000)
+        self.assertEqual(metadata['nb_profiled_rows'], 5000)
+        id_meta, color_meta, number_meta = metadata['columns']
+        self.assertEqual(id_meta['mean'], 2499.5)
+        self.assertAlmostEqual(id_meta['stddev'], 1443.3756, places=4)
+        self.assertLess(abs(id_meta['num_distinct_values'] - 5000), 100)
+        self.assertEqual(color_meta['num_distinct_values'], 3)
+        self.assertEqual(
+            color_meta['plot']['data'],
+            [
+                {'bin': 'blue', 'count': 1000},
+                {'bin': 'green', 'count': 1500},
+                {'bin': 'red', 'count': 2500},
+            ],
+        )
+        self.assertEqual(
+            sum(b['count'] for b in number_meta['plot']['data']),
+            5000,
+        )
+
+    def test_streaming_counts(self):
+        """Test counts from streaming mode against loading the whole file"""
+        with tempfile.NamedTemporaryFile('w+') as tmp:
+            writer = csv.writer(tmp)
+            writer.writerow(['id', 'number'])
+            rand = random.Random(5)
+            for i in range(20000):
+                if rand.random() < 0.05:
+                    number = ''
+                else:
+                    number = rand.randint(0, 1000000)
+                writer.writerow([i, number])
+            tmp.flush()
+
+            full = process_dataset(tmp.name)
+            metadata = process_dataset(
+                tmp.name,
+                load_max_size=20000, streaming=True,
+            )
+
+        self.assertEqual(full['nb_rows'], 20000)
+        self.assertEqual(metadata['nb_rows'], 20000)
+        self.assertEqual(metadata['nb_profiled_rows'], 20000)
+        self.assertEqual(
+            metadata['average_row_size'],
+            full['average_row_size'],
+        )
+        id_meta, number_meta = metadata['columns']
+        full_id_meta, full_number_meta = full['columns']
+        self.assertNotIn('missing_values_ratio', id_meta)
+        self.assertEqual(
+            number_meta['missing_values_ratio'],
+            full_number_meta['missing_values_ratio'],
+        )
+        self.assertLessEqual(id_meta['num_distinct_values'], 20000)
+        self.assertLess(abs(id_meta['num_distinct_values'] - 20000), 500)
+        self.assertLess(
+            abs(
+                number_meta['num_distinct_values']
+                - full_number_meta['num_distinct_values']
+            ),
+            500,
+        )
+
+    def test_sketches(self):
+        """Test merging sketches"""
+        rand = random.Random(1)
+        values = [rand.randint(0, 10000) for _ in range(20000)]
+
+        quantiles = sketches.QuantileSketch()
+        other = sketches.QuantileSketch()
+        quantiles.add(values[:5000])
+        other.add(values[5000:])
+        quantiles.merge(other)
+        self.assertEqual(quantiles.count, 20000)
+        self.assertEqual(
+            list(quantiles.quantiles([0.0, 1.0])),
+            [min(values), max(values)],
+        )
+        self.assertLess(abs(quantiles.quantiles([0.5])[0] - 5000), 200)
+
+        distinct = sketches.HyperLogLog()
+        other = sketches.HyperLogLog()
+        distinct.add([str(v) for v in values[:5000]])
+        other.add([str(v) for v in values[5000:]])
+        distinct.merge(other)
+        self.assertLess(abs(distinct.count() - len(set(values))), 200)
+
+        top = sketches.TopK(3)
+        top.add(['a', 'b', 'a', 'c', 'd'])
+        top.add(['a', 'b', 'e'])
+        self.assertEqual(top.most_common(2), [('a', 3), ('b', 2)])
+
+
+class TestCache(unittest.TestCase):
+    def test_cache(self):
+        """Test getting profiles from the cache"""
+        cache = {}
+        with data('spatiotemporal.csv', 'rb') as data_fp:
+            expected = process_dataset(data_fp, plots=True, cache=cache)
+            self.assertEqual(len(cache), 1)
+            # Data isn't loaded again
+            with mock.patch.object(
+                core, 'load_data',
+                side_effect=AssertionError("Data was loaded"),
+            ):
+                metadata = process_dataset(data_fp, plots=True, cache=cache)
+            self.assertEqual(metadata, expected)
+
+            # Different options are a different key
+            process_dataset(data_fp, plots=False, cache=cache)
+            self.assertEqual(len(cache), 2)
+
+        # Different data is a different key
+        df = pandas.DataFrame({'a': ['1', '2', '3']})
+        process_dataset(df, cache=cache)
+        df.iloc[2, 0] = '4'
+        self.assertEqual(
+            process_dataset(df, cache=cache)['columns'][0]['mean'],
+            7.0 / 3.0,
+        )
+        self.assertEqual(len(cache), 4)
+
+    def test_directory(self):
+        """Test the cache directory"""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ProfileCache(tmp, max_size=25)
+            cache['one'] = '{"value": 1}'
+            cache['two'] = '{"value": 2}'
+            self.assertEqual(cache.get('one'), '{"value": 1}')
+            self.assertEqual(cache.get('two'), '{"value": 2}')
+            self.assertIsNone(cache.get('three'))
+
+            # Using 'one' makes 'two' the least recently used
+            os.utime(os.path.join(tmp, 'two.json'), ns=(0, 0))
+            cache.get('one')
+            cache['three'] = '{"value": 3}'
+            self.assertIn('one', cache)
+            self.assertNotIn('two', cache)
+            self.assertIn('three', cache)
+            self.assertEqual(
+                sorted(os.listdir(tmp)),
+                ['one.json', 'three.json'],
+            )
+
 
 class TestNames(unittest.TestCase):
     def test_names(self):
@@ -149,6 +403,109 @@ class TestNames(unittest.TestCase):
         )
 
 
+class TestLazo(unittest.TestCase):
+    class FakeLazo(object):
+        def __init__(self):
+            self.calls = []
+
+        def index_data(self, values, dataset_id, name):
+            self.calls.append(('index', values, dataset_id, name))
+
+        def get_lazo_sketch_from_data(self, values, dataset_id, name):
+            self.calls.append(('sketch', values, dataset_id, name))
+            return 1, [len(values)], len(values)
+
+    DATA = textwrap.dedent('''\
+        name,number
+        cat,1
+        dog,2
+        cat,3
+        bird,4
+        dog,5
+    ''')
+
+    def test_index(self):
+        """Test sending the distinct values of textual columns to Lazo"""
+        lazo = self.FakeLazo()
+        process_dataset(io.StringIO(self.DATA), 'd1', lazo_client=lazo)
+        self.assertEqual(
+            lazo.calls,
+            [('index', ['cat', 'dog', 'bird'], 'd1', 'name')],
+        )
+
+        lazo = self.FakeLazo()
+        metadata = process_dataset(
+            io.StringIO(self.DATA),
+            lazo_client=lazo,
+            search=True,
+        )
+        self.assertEqual(
+            lazo.calls,
+            [('sketch', ['cat', 'dog', 'bird'], '', 'name')],
+        )
+        self.assertEqual(
+            metadata['columns'][0]['lazo'],
+            {'n_permutations': 1, 'hash_values': [3], 'cardinality': 3},
+        )
+
+    def test_concurrent(self):
+        """Test sending the textual columns to Lazo at the same time"""
+        barrier = threading.Barrier(3, timeout=10)
+
+        class ConcurrentLazo(self.FakeLazo):
+            def get_lazo_sketch_from_data(self, values, dataset_id, name):
+                barrier.wait()
+                return 1, [ord(name)], len(values)
+
+        metadata = process_dataset(
+            io.StringIO(textwrap.dedent('''\
+                a,b,c
+                cat,one,red
+                dog,two,blue
+            ''')),
+            lazo_client=ConcurrentLazo(),
+            search=True,
+        )
+        self.assertEqual(
+            [col['lazo']['hash_values'] for col in metadata['columns']],
+            [[97], [98], [99]],
+        )
+
+    def test_error(self):
+        """Test that pending Lazo calls are cancelled if profiling fails"""
+        barrier = threading.Barrier(core.LAZO_CONCURRENCY + 1, timeout=10)
+        release = threading.Event()
+        finished = []
+
+        class BlockingLazo(self.FakeLazo):
+            def index_data(self, values, dataset_id, name):
+                self.calls.append(name)
+                barrier.wait()
+                release.wait(10)
+                finished.append(name)
+
+        def fail(columns_lat, columns_long):
+            barrier.wait()  # All the threads are busy
+            threading.Timer(0.2, release.set).start()
+            raise ValueError("Profiling failed")
+
+        lazo = BlockingLazo()
+        with mock.patch.object(core, 'pair_latlong_columns', side_effect=fail):
+            with self.assertRaises(ValueError):
+                process_dataset(
+                    io.StringIO(textwrap.dedent('''\
+                        a,b,c,d,e,f
+                        cat,one,red,north,up,left
+                        dog,two,blue,south,down,right
+                    ''')),
+                    'd1',
+                    lazo_client=lazo,
+                )
+        # The calls that started are done, the others never start
+        self.assertEqual(len(lazo.calls), core.LAZO_CONCURRENCY)
+        self.assertEqual(sorted(finished), sorted(lazo.calls))
+
+
 class TestIndex(unittest.TestCase):
     DATA = pandas.DataFrame({
         'a': [1, 1, 2, 2],
@@ -204,6 +561,109 @@ class TestIndex(unittest.TestCase):
         )
 
 
+class TestTyped(unittest.TestCase):
+    DATA = pandas.DataFrame({
+        'id': [4, 1, 2, 3, 5, 6],
+        'flag': [True, False, False, True, True, True],
+        'year': [2001, 2002, 2002, 2003, 2003, 2003],
+        'latitude': [40.1, 40.2, float('nan'), 40.4, 40.5, 40.6],
+        'longitude': [-73.1, -73.2, -73.3, -73.4, -73.5, -73.6],
+        'tiny': [1e-5, 2e-5, 3e-5, 4e-5, 5e-5, 6e-5],
+        'round': [1.0, 2.0, 3.0, 4.0, 5.0, float('inf')],
+        'zero': [0.0, -0.0, float('nan'), 1.0, -0.0, 0.0],
+        'when': pandas.to_datetime([
+            '2020-01-01 10:00', '2020-01-02 11:00', None,
+            '2020-01-04 12:00', '2020-01-05 13:00', '2020-01-06 14:00',
+        ]).tz_localize('US/Eastern'),
+    })
+
+    def test_typed(self):
+        """Test profiling typed columns without turning them into strings"""
+        typed = process_dataset(self.DATA, coverage=True, plots=True)
+        strings = process_dataset(
+            self.DATA.astype(object).fillna('').astype(str),
+            coverage=True, plots=True,
+        )
+        self.assertEqual(typed, strings)
+
+    def test_parquet(self):
+        """Test profiling a Parquet file with typed columns"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'data.parquet')
+            self.DATA.to_parquet(path)
+            metadata = process_dataset(path, coverage=True, plots=True)
+        self.assertEqual(
+            metadata,
+            process_dataset(self.DATA, coverage=True, plots=True),
+        )
+
+    def test_parquet_sample(self):
+        """Test sampling a big Parquet file"""
+        df = pandas.DataFrame({
+            'number': numpy.arange(10000),
+            'text': ['value %d' % i for i in range(10000)],
+        })
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'data.parquet')
+
+            # Whole row groups
+            df.to_parquet(path, row_group_size=1000)
+            data, metadata, _ = load_data(path, load_max_size=50000)
+            self.assertEqual(metadata, {'nb_rows': 10000})
+            self.assertTrue(1000 <= len(data) < 10000)
+            self.assertEqual(len(data) % 1000, 0)
+            self.assertEqual(list(data['number']), sorted(data['number']))
+            self.assertEqual(
+                list(data['text']),
+                ['value %d' % i for i in data['number']],
+            )
+
+            # Rows from a single big row group
+            df.to_parquet(path)
+            data, metadata, _ = load_data(path, load_max_size=50000)
+            self.assertEqual(metadata, {'nb_rows': 10000})
+            self.assertTrue(1000 <= len(data) < 9000)
+
+            metadata = process_dataset(path, load_max_size=50000)
+            self.assertEqual(metadata['nb_rows'], 10000)
+            self.assertEqual(metadata['nb_profiled_rows'], len(data))
+
+    def test_arrow_strings(self):
+        """Test keeping strings in Arrow buffers"""
+        with data('spatiotemporal.csv', 'r') as data_fp:
+            df, _, _ = load_data(data_fp, arrow_strings=True)
+        self.assertEqual(
+            list(df.dtypes),
+            [pandas.StringDtype('pyarrow')] * df.shape[1],
+        )
+        with data('spatiotemporal.csv', 'r') as data_fp:
+            df, _, _ = load_data(data_fp, arrow_strings=False)
+        self.assertEqual(list(df.dtypes), [numpy.dtype(object)] * df.shape[1])
+
+        with data('spatiotemporal.csv', 'r') as data_fp:
+            expected = process_dataset(
+                data_fp, plots=True, include_sample=True,
+                arrow_strings=False,
+            )
+        with data('spatiotemporal.csv', 'r') as data_fp:
+            metadata = process_dataset(
+                data_fp, plots=True, include_sample=True,
+                arrow_strings=True,
+            )
+        self.assertEqual(metadata, expected)
+
+
+class TestWorkers(unittest.TestCase):
+    def test_workers(self):
+        """Test profiling columns in worker processes"""
+        for name in ('spatiotemporal.csv', 'geo_wkt.csv'):
+            with data(name, 'r') as data_fp:
+                df = pandas.read_csv(data_fp, dtype=str, na_filter=False)
+            expected = process_dataset(df, plots=True)
+            metadata = process_dataset(df, plots=True, workers=2)
+            self.assertEqual(metadata, expected)
+
+
 class TestLatlongSelection(DataTestCase):
     def test_normalize_name(self):
         """Test normalizing column names"""
@@ -352,6 +812,53 @@ class TestDates(DataTestCase):
             None,
         )
 
+    def test_parse_distinct(self):
+        """Test parsing a column of dates, repeating distinct values"""
+        self.assertEqual(
+            profile_types.parse_dates(
+                ['2019-07-02', 'July', '', '2019-07-02', '2020-01-01'],
+            ),
+            [
+                datetime(2019, 7, 2, tzinfo=UTC),
+                datetime(2019, 7, 2, tzinfo=UTC),
+                datetime(2020, 1, 1, tzinfo=UTC),
+            ],
+        )
+        self.assertEqual(
+            profile_types.parse_dates(['2019-07-02', 'July'], [3, 10]),
+            [datetime(2019, 7, 2, tzinfo=UTC)] * 3,
+        )
+
+    def test_parse_format(self):
+        """Test parsing dates with an inferred format"""
+        values = [
+            '2019-07-02 18:05:00', '2019-07-03 09:30:15', '2019-7-4 10:00:00',
+            '2019-07-05T11:00:00', '2019-07-06 12:00:00Z', '18:05', '',
+            'July 2020', '2019-07-07 12:00:00-04:00',
+        ]
+        self.assertEqual(
+            temporal.infer_date_format(values),
+            '%Y-%m-%d %H:%M:%S',
+        )
+        self.assertEqual(
+            temporal.parse_dates_all(values),
+            [parse_date(value) for value in values],
+        )
+        self.assertEqual(temporal.infer_date_format(['1.5', '12']), None)
+
+    def test_parse_threshold(self):
+        """Test giving up on parsing a column that is not dates"""
+        values = ['2019-07-02'] + [str(i) for i in range(3000)]
+        counts = [5] + [1] * 3000
+        self.assertEqual(
+            profile_types.parse_dates(values, counts, threshold=3000),
+            [],
+        )
+        self.assertEqual(
+            profile_types.parse_dates(values, counts, threshold=5),
+            [datetime(2019, 7, 2, tzinfo=UTC)] * 5,
+        )
+
     def test_year(self):
         """Test the 'year' special-case"""
         dataframe = pandas.DataFrame({
@@ -415,6 +922,58 @@ class TestDates(DataTestCase):
         )
 
 
+class TestNumericalRanges(unittest.TestCase):
+    def test_ranges(self):
+        """Test computing numerical ranges, dropping outliers"""
+        values = (
+            list(range(0, 100))
+            + list(range(1000, 1100))
+            + list(range(5000, 5200))
+            + [100000]
+        )
+        random.Random(1).shuffle(values)
+        self.assertEqual(
+            get_numerical_ranges(values),
+            [
+                {'range': {'gte': 10.0, 'lte': 1090.0}},
+                {'range': {'gte': 5010.0, 'lte': 5190.0}},
+            ],
+        )
+
+    def test_few_values(self):
+        """Test computing numerical ranges with fewer values than ranges"""
+        self.assertEqual(
+            get_numerical_ranges([2.0] * 50 + [1.0] * 30),
+            [
+                {'range': {'gte': 1.0, 'lte': 1.0}},
+                {'range': {'gte': 2.0, 'lte': 2.0}},
+            ],
+        )
+        self.assertEqual(
+            get_numerical_ranges([7]),
+            [{'range': {'gte': 7.0, 'lte': 7.0}}],
+        )
+        self.assertEqual(get_numerical_ranges([]), [])
+
+    def test_counts(self):
+        """Test computing statistics from distinct values and their counts"""
+        values = [3.0, 1.0, 2.0, 1.0]
+        counts = [1, 2, 3, 0]
+        expanded = [3.0, 1.0, 1.0, 2.0, 2.0, 2.0]
+        self.assertEqual(
+            mean_stddev(values, counts),
+            mean_stddev(expanded),
+        )
+        self.assertAlmostEqual(mean_stddev(expanded)[0], 11.0 / 6.0)
+        self.assertAlmostEqual(mean_stddev(expanded)[1], 0.6871842709)
+        self.assertEqual(mean_stddev([None, 2.0, 4.0]), (3.0, 1.0))
+        self.assertEqual(mean_stddev([]), (0, 0))
+        self.assertEqual(
+            get_numerical_ranges(values, counts),
+            get_numerical_ranges(expanded),
+        )
+
+
 class TestTemporalResolutions(unittest.TestCase):
     def test_pandas(self):
         """Test guessing temporal resolution of Pandas values"""
@@ -432,6 +991,22 @@ class TestTemporalResolutions(unittest.TestCase):
 
         self.do_checks(get_res)
 
+    def test_timezones(self):
+        """Test guessing temporal resolution with different timezones"""
+        # Same local hours, different instants
+        values = [
+            parse_date('2020-01-01T%02d:00:00%s' % (hour, tz))
+            for hour in range(5)
+            for tz in ('Z', '-04:00')
+        ]
+        self.assertEqual(get_temporal_resolution(values), 'second')
+        # Weeks across the year boundary, in local time
+        values = [
+            parse_date('%s 23:00:00-04:00' % day)
+            for day in ['2019-12-22', '2019-12-29', '2020-01-05', '2020-01-12']
+        ]
+        self.assertEqual(get_temporal_resolution(values), 'week')
+
     def do_checks(self, get_res):
         self.assertEqual(
             get_res([
@@ -693,6 +1268,158 @@ class TestTypes(unittest.TestCase):
             positive, negative,
         )
 
+    def test_type_sampling(self):
+        """Test detecting types on a sample of the values first"""
+        rand = random.Random(2)
+        df = pandas.DataFrame({
+            'number': [str(rand.randint(0, 10 ** 9)) for _ in range(50000)],
+            'mostly': [
+                'unknown' if i % 50 == 0 else str(i) for i in range(50000)
+            ],
+            'text': [
+                'word %d and %d' % (i, rand.randint(0, 99))
+                for i in range(50000)
+            ],
+            'color': [['red', 'green', 'blue'][i % 3] for i in range(50000)],
+        })
+        expected = process_dataset(df)
+        metadata = process_dataset(df, type_sampling=True)
+        self.assertEqual(
+            [col.pop('type_detection') for col in metadata['columns']],
+            ['sample', 'full', 'sample', 'full'],
+        )
+        number, mostly, text, color = metadata['columns']
+        for col, expected_col in zip(metadata['columns'], expected['columns']):
+            self.assertEqual(
+                col['structural_type'],
+                expected_col['structural_type'],
+            )
+            self.assertEqual(
+                col['semantic_types'],
+                expected_col['semantic_types'],
+            )
+        self.assertEqual(mostly, expected['columns'][1])
+        self.assertEqual(color, expected['columns'][3])
+        self.assertEqual(number['unclean_values_ratio'], 0.0)
+
+    def test_distinct_count(self):
+        """Test categorical detection from the number of distinct values"""
+        colors = ['red', 'green', '', 'blue', 'green', 'red'] * 10
+        structural_type, semantic_types_dict, column_meta = \
+            profile_types.identify_types(colors, 'color', None)
+        self.assertEqual(column_meta['num_distinct_values'], 3)
+        self.assertEqual(
+            semantic_types_dict['http://schema.org/Enumeration'],
+            {'red', 'green', 'blue'},
+        )
+
+        names = ['name %d' % i for i in range(60)]
+        structural_type, semantic_types_dict, column_meta = \
+            profile_types.identify_types(names, 'name', None)
+        self.assertEqual(column_meta['num_distinct_values'], 60)
+        self.assertNotIn(
+            'http://schema.org/Enumeration',
+            semantic_types_dict,
+        )
+
+    def test_plots(self):
+        """Test the top values of categorical and text plots"""
+        df = pandas.DataFrame({
+            'color': ['red', 'green', '', 'blue', 'green', 'pink', 'red',
+                      'black', 'white', 'green', 'grey', 'grey'] * 10,
+            'text': [
+                'the word %d, the word %d and %s' % (i, i % 7, 'x' * (i % 3))
+                for i in range(120)
+            ],
+        })
+        metadata = process_dataset(df, plots=True)
+        color, text = metadata['columns']
+        self.assertEqual(color['num_distinct_values'], 7)
+        self.assertEqual(
+            color['plot']['data'],
+            [
+                {'bin': 'blue', 'count': 10},
+                {'bin': 'green', 'count': 30},
+                {'bin': 'grey', 'count': 20},
+                {'bin': 'pink', 'count': 10},
+                {'bin': 'red', 'count': 20},
+            ],
+        )
+        self.assertEqual(
+            text['plot']['data'],
+            [
+                {'bin': 'the', 'count': 240},
+                {'bin': 'word', 'count': 240},
+                {'bin': 'and', 'count': 120},
+                {'bin': 'x', 'count': 40},
+                {'bin': 'xx', 'count': 40},
+            ],
+        )
+
+    def test_text_plot_counter(self):
+        """Test that text plots count words exactly, like a Counter"""
+        def expected_plot(values):
+            counter = collections.Counter()
+            for value in values:
+                for word in re.split(r'\W+', value):
+                    word = word.lower()
+                    if word:
+                        counter[word] += 1
+            return [
+                {'bin': word, 'count': count}
+                for word, count in counter.most_common(5)
+            ]
+
+        rand = random.Random(5)
+        many_words = [
+            'the m%d and n%d for id%d' % (
+                rand.randint(0, 9999), rand.randint(0, 9999), i,
+            )
+            for i in range(12000)
+        ] + [
+            'a rare%d word id%d' % (i, i)
+            for i in range(1200)
+        ]
+        non_ascii = [
+            '%s İstanbul Straße n°%d ΣΊΣΥΦΟΣ' % (
+                rand.choice(['Vue', 'vue', 'VUE', 'Ünïcode']), i,
+            )
+            for i in range(200)
+        ]
+        for values in (many_words, non_ascii):
+            metadata = process_dataset(
+                pandas.DataFrame({'text': values}),
+                plots=True,
+            )
+            column, = metadata['columns']
+            self.assertEqual(column['plot']['type'], 'histogram_text')
+            self.assertEqual(column['plot']['data'], expected_plot(values))
+
+    def test_regular_exp_count(self):
+        """Test counting the structure of all the values in a column"""
+        self.assertEqual(
+            profile_types.regular_exp_count([
+                '12', '', '1', '4.5', '12', 'yes',
+                'http://example.org/', 'POINT (1.5 2.5)', '(40.7, -73.9)',
+                'several words in here', 'no', '',
+            ]),
+            {
+                'int': 3,
+                'empty': 2,
+                'float': 1,
+                'bool': 3,
+                'url': 1,
+                'point': 1,
+                'latlong_point': 1,
+                'text': 1,
+            },
+        )
+        values, counts = profile_types.distinct_values_counts(
+            ['b', 'a', 'b', '', 'b'],
+        )
+        self.assertEqual(list(values), ['b', 'a', ''])
+        self.assertEqual(list(counts), [3, 1, 1])
+
 
 class TestTruncate(unittest.TestCase):
     def test_simple(self):
@@ -721,6 +1448,19 @@ class TestTruncate(unittest.TestCase):
             "abc defghijklmnopqrstuvwxyz...",
         )
 
+    def test_column(self):
+        """Test truncating the long strings of a column"""
+        from datamart_profiler.core import truncate_strings
+
+        values = pandas.Series(["abc", "abcdefghijk", "", "abcdefghij"])
+        self.assertEqual(
+            list(truncate_strings(values, 10)),
+            ["abc", "abcdefg...", "", "abcdefghij"],
+        )
+        self.assertEqual(values[1], "abcdefghijk")
+        short = values.iloc[[0, 3]]
+        self.assertIs(truncate_strings(short, 10), short)
+
 
 class TestNominatim(DataTestCase):
     """Test resolving addresses, mocking Nominatim queries"""
@@ -737,7 +1477,7 @@ class TestNominatim(DataTestCase):
             }],
         }
 
-        def replacement(url, *, q):
+        def replacement(url, *, q, **kwargs):
             if not replacement.failed:  # Fail just once
                 replacement.failed = True
                 response = requests.Response()
@@ -814,7 +1554,7 @@ class TestNominatim(DataTestCase):
         }
         old_query = spatial.nominatim_query
         spatial.nominatim_query = \
-            lambda url, *, q: [queries[qe] for qe in q]
+            lambda url, *, q, **kwargs: [queries[qe] for qe in q]
         try:
             res, empty = spatial.nominatim_resolve_all(
                 'http://240.123.45.67:21',
@@ -854,6 +1594,92 @@ class TestNominatim(DataTestCase):
         finally:
             spatial.nominatim_query = old_query
 
+    def test_client(self):
+        """Test querying a local server concurrently, with a cache"""
+        addresses = {'addr %d' % i: (i * 0.5, -i * 0.5) for i in range(50)}
+        array = ['addr %d' % (i % 60) for i in range(200)]
+        expected = [
+            addresses[value]
+            for value in dict.fromkeys(array)
+            if value in addresses
+            for _ in range(array.count(value))
+        ]
+        with contextlib.ExitStack() as stack:
+            url, batches = stack.enter_context(fake_nominatim(addresses))
+            tmp = stack.enter_context(tempfile.TemporaryDirectory())
+            cache_path = os.path.join(tmp, 'nominatim.sqlite3')
+
+            client = spatial.NominatimClient(url, cache_path, concurrency=3)
+            res, non_empty = spatial.nominatim_resolve_all(client, array)
+            self.assertEqual(res, expected)
+            self.assertEqual(non_empty, 200)
+            self.assertEqual(
+                sorted(sum(batches, [])),
+                sorted(dict.fromkeys(array)),
+            )
+            self.assertEqual(len(batches), 3)
+
+            # Results are read from the cache, including not found
+            batches[:] = []
+            client = spatial.NominatimClient(url, cache_path)
+            res, _ = spatial.nominatim_resolve_all(client, array)
+            self.assertEqual(res, expected)
+            self.assertEqual(batches, [])
+
+            # Unless they expired
+            client = spatial.NominatimClient(url, cache_path, ttl=-1)
+            res, _ = spatial.nominatim_resolve_all(client, array)
+            self.assertEqual(res, expected)
+            self.assertEqual(len(batches), 3)
+
+    def test_client_error(self):
+        """Test that resolved batches are cached when another one fails"""
+        addresses = {'addr %d' % i: (i * 0.5, -i * 0.5) for i in range(60)}
+        array = list(addresses)
+        fail = {'addr 25'}
+        with contextlib.ExitStack() as stack:
+            url, batches = stack.enter_context(
+                fake_nominatim(addresses, fail=fail),
+            )
+            tmp = stack.enter_context(tempfile.TemporaryDirectory())
+            cache_path = os.path.join(tmp, 'nominatim.sqlite3')
+
+            client = spatial.NominatimClient(url, cache_path, concurrency=3)
+            with self.assertRaises(requests.HTTPError):
+                client.resolve(array)
+            self.assertEqual(len(batches), 3)
+
+            # Only the batch that failed is sent again
+            fail.clear()
+            batches[:] = []
+            client = spatial.NominatimClient(url, cache_path, concurrency=3)
+            res, queried = client.resolve(array)
+            self.assertEqual(res, addresses)
+            self.assertEqual(queried, 20)
+            self.assertEqual(batches, [array[20:40]])
+
+    def test_client_retry(self):
+        """Test that retries are rate-limited too"""
+        addresses = {'a': (1.0, 2.0), 'b': (3.0, 4.0)}
+        with fake_nominatim(addresses, unavailable=1) as (url, batches):
+            client = spatial.NominatimClient(url)
+            with mock.patch.object(
+                client._bucket, 'acquire',
+                wraps=client._bucket.acquire,
+            ) as acquire:
+                res, _ = client.resolve(['a', 'b'])
+        self.assertEqual(res, addresses)
+        self.assertEqual(batches, [['a', 'b'], ['a', 'b']])
+        self.assertEqual(acquire.call_count, 2)
+
+    def test_token_bucket(self):
+        """Test that the token bucket limits the rate after the first burst"""
+        bucket = spatial.TokenBucket(100.0, burst=5)
+        start = time.perf_counter()
+        for _ in range(15):
+            bucket.acquire()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.09)
+
 
 class TestGeo(DataTestCase):
     @classmethod
@@ -1239,6 +2065,144 @@ class TestGeo(DataTestCase):
         )
 
 
+class FakeGeoData(object):
+    def __init__(self, data_path, areas):
+        self._data_path = data_path
+        self.areas = areas
+        self.resolved = []
+
+    def resolve_name_all(self, name):
+        name = datamart_geo.normalize(name)
+        self.resolved.append(name)
+        for area in self.areas.get(name, []):
+            yield spatial.area_from_tuple(self, area)
+
+    def resolve_names_all(self, names):
+        return [list(self.resolve_name_all(name)) for name in names]
+
+
+class TestAdminCache(unittest.TestCase):
+    AREAS = {
+        'france': [
+            (1, 'France', 0, (1, None, None, None, None, None),
+             46.0, 2.0, (-5.0, 9.0, 41.0, 51.0)),
+        ],
+        'paris': [
+            (2, 'Paris', 1, (1, 2, None, None, None, None),
+             48.8, 2.3, None),
+            (3, 'Paris', 2, (4, 5, 3, None, None, None),
+             33.6, -95.5, (-95.6, -95.5, 33.6, 33.7)),
+        ],
+    }
+
+    def test_cache(self):
+        """Test caching resolved names in memory and in a file"""
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'admins.gpkg'), 'wb'):
+                pass
+            fake = FakeGeoData(tmp, self.AREAS)
+            cache_path = os.path.join(tmp, 'cache.sqlite3')
+            expected = [
+                [spatial.area_from_tuple(fake, a) for a in self.AREAS[n]]
+                for n in ('france', 'paris')
+            ] + [[]]
+
+            geo_data = spatial.CachedGeoData(fake, cache_path, size=2)
+            self.assertEqual(geo_data._data_path, tmp)
+            result = geo_data.resolve_names_all(['France', 'PARIS', 'x'])
+            self.assertEqual(result, expected)
+            self.assertEqual(
+                [[a.bounds for a in r] for r in result],
+                [[a.bounds for a in r] for r in expected],
+            )
+            self.assertEqual(sorted(fake.resolved), ['france', 'paris', 'x'])
+
+            # In memory, 'france' was evicted
+            fake.resolved[:] = []
+            self.assertEqual(geo_data.resolve_names_all(['x']), [[]])
+            self.assertEqual(fake.resolved, [])
+
+            # From the file
+            geo_data = spatial.CachedGeoData(fake, cache_path)
+            result = geo_data.resolve_names_all(['france', 'paris', 'x'])
+            self.assertEqual(result, expected)
+            self.assertEqual(
+                [[(a.levels, a.bounds) for a in r] for r in result],
+                [[(a.levels, a.bounds) for a in r] for r in expected],
+            )
+            self.assertEqual(fake.resolved, [])
+
+    def test_prefilter(self):
+        """Test giving up on resolving values that are not names"""
+        fake = FakeGeoData(None, self.AREAS)
+        self.assertIsNone(profile_types.resolve_admin_areas(
+            fake,
+            ['france', 'paris', '12', '13', '14', '15', 'a' * 200],
+            0.7 * 7,
+        ))
+        self.assertEqual(fake.resolved, [])
+
+        names = ['f%d' % i for i in range(500)] + ['france', 'paris']
+        self.assertIsNone(profile_types.resolve_admin_areas(
+            fake, names, 0.7 * len(names),
+        ))
+        self.assertEqual(len(fake.resolved), 200)
+
+        fake.resolved[:] = []
+        areas = profile_types.resolve_admin_areas(
+            fake, ['france', 'paris', 'Paris', '1234'], 2,
+        )
+        self.assertEqual(
+            [[a.id for a in r] for r in areas],
+            [[1], [2, 3], [2, 3]],
+        )
+
+
+class TestSpatialRanges(unittest.TestCase):
+    def test_sample(self):
+        """Test computing spatial ranges from a sample of the points"""
+        rand = random.Random(3)
+        points = [
+            (rand.gauss(lat, 1.0), rand.gauss(long, 1.0))
+            for lat, long in [(40.0, -74.0), (48.0, 2.0), (-33.0, 151.0)]
+            for _ in range(2000)
+        ]
+        ranges = get_spatial_ranges(points)
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(get_spatial_ranges(points), ranges)
+        sampled = get_spatial_ranges(points, max_points=300)
+        self.assertEqual(get_spatial_ranges(points, max_points=300), sampled)
+        # Clusters are the same, points are all assigned
+        self.assertEqual(sampled, ranges)
+
+    def test_parse_wkt(self):
+        """Test parsing a column of points into an array"""
+        values = pandas.Series([
+            'POINT (-74.005 40.712)', '', '(2.35, 48.85)', 'POINT (2 48)',
+            '(200.0 10.0)', None, '(151.2,-33.8) ', '(151.2,-33.8)',
+        ])
+        self.assertEqual(
+            parse_wkt_column(values).tolist(),
+            [[40.712, -74.005], [48.85, 2.35], [-33.8, 151.2]],
+        )
+        self.assertEqual(
+            parse_wkt_column(values, latlong=True).tolist(),
+            [[-74.005, 40.712], [2.35, 48.85]],
+        )
+        self.assertEqual(parse_wkt_column(values.iloc[:0]).shape, (0, 2))
+
+    def test_parse_wkt_fallback(self):
+        """Test parsing points without pyarrow, the same way"""
+        values = pandas.Series([
+            'POINT (-74.005 40.712)', '(2.35, 48.85)\n', '(2.35, 48.85)\n\n',
+            '(151.2,-33.8)\r\n', 'POINT (2.0 48.0) x', '', None,
+        ])
+        expected = [[40.712, -74.005], [48.85, 2.35]]
+        self.assertEqual(parse_wkt_column(values).tolist(), expected)
+        with mock.patch.object(spatial, 'pyarrow', None):
+            self.assertEqual(parse_wkt_column(values).tolist(), expected)
+
+
 class TestGeoHash(unittest.TestCase):
     def test_bit_encoding(self):
         self.assertEqual(
@@ -1404,6 +2368,38 @@ class TestGeoHash(unittest.TestCase):
             [('', 4)],
         )
 
+    def test_sketch_points_batch(self):
+        """Test that adding points at once is the same as one by one
+
+        The points are added one by one with ``_add_point()``, which builds the
+        tree without the vectorized code.
+        """
+        rand = random.Random(2)
+        points = [
+            (rand.gauss(40.7, 0.1), rand.gauss(-73.9, 0.1))
+            for _ in range(500)
+        ] + [
+            (rand.uniform(-90.0, 90.0), rand.uniform(-180.0, 180.0))
+            for _ in range(50)
+        ]
+        rand.shuffle(points)
+        for number in (1, 5, 100):
+            batch = spatial.Geohasher(number=number)
+            batch.add_points(points[:200])
+            batch.add_points(points[200:])
+            single = spatial.Geohasher(number=number)
+            for point in points:
+                single._add_point(point)
+            self.assertEqual(batch.precision, single.precision)
+            self.assertEqual(batch.get_hashes(), single.get_hashes())
+            self.assertEqual(
+                {h for h, _ in batch.get_hashes()},
+                {
+                    spatial.hash_location(p, base=4)[:batch.precision]
+                    for p in points
+                },
+            )
+
     def test_sketch_aab(self):
         builder = spatial.Geohasher(
             base=4,
@@ -1438,6 +2434,42 @@ class TestGeoHash(unittest.TestCase):
             ],
         )
 
+    def test_sketch_aab_stop(self):
+        """Test that a box stops at the level that has too many cells"""
+        builder = spatial.Geohasher(
+            base=4,
+            precision=8,
+            number=10,
+        )
+        builder.add_aab((-179.0, 179.0, -89.0, 89.0))
+        self.assertEqual(builder.precision, 1)
+        self.assertEqual(
+            builder.get_hashes(),
+            [('0', 1), ('1', 1), ('2', 1), ('3', 1)],
+        )
+        # Only one cell past the limit was added at level 2, and none below
+        self.assertEqual(builder.number_at_level[:3], [4, 11, 0])
+
+    def test_sketch_aab_wrap(self):
+        """Test boxes crossing the antimeridian, with base 32"""
+        builder = spatial.Geohasher(
+            base=32,
+            precision=3,
+            number=30,
+        )
+        builder.add_aab((170.0, -170.0, -10.0, 10.0))
+        builder.add_aab((-5.0, 5.0, 40.0, 60.0))
+        self.assertEqual(builder.precision, 2)
+        self.assertEqual(
+            builder.get_hashes(),
+            [
+                ('ry', 1), ('rz', 1), ('xb', 1), ('xc', 1),
+                ('2n', 1), ('2p', 1), ('80', 1), ('81', 1),
+                ('ez', 1), ('gb', 1), ('gc', 1), ('gf', 1),
+                ('sp', 1), ('u0', 1), ('u1', 1), ('u4', 1),
+            ],
+        )
+
 
 class TestMedianDist(unittest.TestCase):
     def test_median_dist(self):
@@ -1,6 +1,11 @@
+import contextlib
+import http.server
 import itertools
+import json
 import os
+import threading
 import unittest
+from urllib.parse import parse_qs, urlparse
 
 
 def data(name, mode='rb', **kwargs):
@@ -14,6 +19,56 @@ def data(name, mode='rb', **kwargs):
     )
 
 
+@contextlib.contextmanager
+def fake_nominatim(locations, delay=0.0, fail=(), unavailable=0):
+    """Run a local stand-in for a Nominatim server, answering batch queries.
+
+    :param locations: Dict mapping addresses to ``(lat, lon)`` tuples
+    :param delay: Time to wait before answering each request
+    :param fail: Addresses for which the whole batch gets a 400 error
+    :param unavailable: Number of requests answered with 503 first
+    :return: The URL of the server, and the list of batches it received
+    """
+    batches = []
+    request_numbers = itertools.count()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            batch = [e['q'] for e in json.loads(query['batch'][0])]
+            batches.append(batch)
+            threading.Event().wait(delay)
+            if next(request_numbers) < unavailable:
+                self.send_error(503)
+                return
+            if any(q in fail for q in batch):
+                self.send_error(400)
+                return
+            body = json.dumps({'batch': [
+                [{'lat': str(locations[q][0]), 'lon': str(locations[q][1])}]
+                if q in locations else []
+                for q in batch
+            ]}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield 'http://127.0.0.1:%d' % server.server_address[1], batches
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
 class DataTestCase(unittest.TestCase):
     def assertJson(self, actual, expected, pos='@'):
         if callable(expected):